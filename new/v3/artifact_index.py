@@ -0,0 +1,96 @@
+import os
+from typing import Any, Dict, Optional
+
+import redis
+
+from redis_store import DEFAULT_REDIS_URL, RedisStore
+
+# 任务产物索引所在的 Redis，默认与 Celery 结果后端相同
+ARTIFACT_REDIS_URL = os.getenv("ARTIFACT_REDIS_URL", DEFAULT_REDIS_URL)
+ARTIFACT_KEY_PREFIX = "crawler:artifact:"
+# 索引记录的过期时间（秒），0 表示永不过期
+ARTIFACT_TTL = int(os.getenv("ARTIFACT_INDEX_TTL", "0"))
+
+# 从爬取结果中记录的字段
+ARTIFACT_FIELDS = (
+    "file_path",
+    "bv_id",
+    "video_title",
+    "total_comments",
+    "output_format",
+    "content_encoding",
+    "index_file",
+)
+
+
+def artifact_key(task_id: str) -> str:
+    """返回任务产物记录在 Redis 中的键"""
+    return f"{ARTIFACT_KEY_PREFIX}{task_id}"
+
+
+class ArtifactIndex(RedisStore):
+    """
+    任务ID -> 结果文件的持久索引，保存在 Redis 哈希中。
+    Celery 任务完成时写入，所有 API 进程共享读取，重启后仍然有效。
+    Redis 不可用时读写都只打印警告，读取返回 None，由调用方决定如何回退。
+    """
+
+    def __init__(self, redis_url: str = ARTIFACT_REDIS_URL):
+        super().__init__(redis_url)
+
+    def record(self, task_id: str, result: Dict[str, Any]) -> bool:
+        """
+        记录任务的结果文件
+
+        Args:
+            task_id: 任务 ID
+            result: 爬虫返回的结果字典，至少包含 file_path
+
+        Returns:
+            bool: True表示写入成功
+        """
+        mapping = {
+            field: str(result[field])
+            for field in ARTIFACT_FIELDS
+            if result.get(field) is not None
+        }
+        if "file_path" not in mapping:
+            return False
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.hset(artifact_key(task_id), mapping=mapping)
+                if ARTIFACT_TTL > 0:
+                    pipe.expire(artifact_key(task_id), ARTIFACT_TTL)
+                pipe.execute()
+            return True
+        except redis.RedisError as e:
+            print(f"⚠️ 写入任务 {task_id} 的产物索引失败: {e}")
+            return False
+
+    def get(self, task_id: str) -> Optional[Dict[str, str]]:
+        """
+        读取任务的结果文件记录
+
+        Args:
+            task_id: 任务 ID
+
+        Returns:
+            记录字典，不存在或 Redis 不可用时返回 None
+        """
+        try:
+            return self.client.hgetall(artifact_key(task_id)) or None
+        except redis.RedisError as e:
+            print(f"⚠️ 读取任务 {task_id} 的产物索引失败: {e}")
+            return None
+
+    async def aget(self, task_id: str) -> Optional[Dict[str, str]]:
+        """get 的异步版本，供 async 接口使用，不阻塞事件循环"""
+        try:
+            return await self.async_client.hgetall(artifact_key(task_id)) or None
+        except redis.RedisError as e:
+            print(f"⚠️ 读取任务 {task_id} 的产物索引失败: {e}")
+            return None
+
+
+# 进程内共享的索引实例
+artifact_index = ArtifactIndex()
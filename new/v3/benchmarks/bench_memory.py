@@ -0,0 +1,160 @@
+"""
+评论内存占用基准测试：对比原始接口字典与精简评论记录（CommentRecord）
+
+按B站评论接口的真实结构生成合成评论（含头像、装扮、等级、表情等字段），
+每条评论都经过 json.loads 解析，与实际抓取时一样拥有各自独立的字符串对象。
+分别统计以rpid为键保存原始字典和保存精简记录时的内存占用。
+
+用法:
+    python benchmarks/bench_memory.py [--comments 100000] [--users 20000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_records import CommentRecord  # noqa: E402
+
+
+def make_raw_comment(rpid: int, user_id: int, rng: random.Random) -> str:
+    """生成一条结构接近B站接口返回的原始评论（JSON文本）"""
+    root = 0 if rng.random() < 0.3 else rng.randint(1, max(1, rpid - 1))
+    uname = f"用户{user_id}"
+    return json.dumps(
+        {
+            "rpid": rpid,
+            "oid": 114514,
+            "type": 1,
+            "mid": user_id,
+            "root": root,
+            "parent": root,
+            "dialog": root,
+            "count": 0,
+            "rcount": 0,
+            "state": 0,
+            "fansgrade": 0,
+            "attr": 0,
+            "ctime": 1700000000 + rpid,
+            "like": rng.randint(0, 5000),
+            "action": 0,
+            "member": {
+                "mid": str(user_id),
+                "uname": uname,
+                "sex": "保密",
+                "sign": "这个人很神秘，什么都没有写",
+                "avatar": f"https://i0.hdslb.com/bfs/face/{user_id:040x}.jpg",
+                "rank": "10000",
+                "face_nft_new": 0,
+                "is_senior_member": 0,
+                "level_info": {
+                    "current_level": rng.randint(0, 6),
+                    "current_min": 0,
+                    "current_exp": 0,
+                    "next_exp": 0,
+                },
+                "pendant": {
+                    "pid": 0,
+                    "name": "",
+                    "image": "",
+                    "expire": 0,
+                    "image_enhance": "",
+                    "image_enhance_frame": "",
+                },
+                "nameplate": {
+                    "nid": 0,
+                    "name": "",
+                    "image": "",
+                    "image_small": "",
+                    "level": "",
+                    "condition": "",
+                },
+                "official_verify": {"type": -1, "desc": ""},
+                "vip": {
+                    "vipType": 1,
+                    "vipDueDate": 1700000000000,
+                    "vipStatus": 1,
+                    "themeType": 0,
+                    "label": {"path": "", "text": "", "label_theme": ""},
+                    "avatar_subscript": 0,
+                    "nickname_color": "",
+                },
+                "user_sailing": {"pendant": None, "cardbg": None},
+            },
+            "content": {
+                "message": f"第{rpid}条评论[doge] " + "评论内容" * rng.randint(1, 20),
+                "members": [],
+                "emote": {
+                    "[doge]": {
+                        "id": 26,
+                        "package_id": 1,
+                        "state": 0,
+                        "type": 1,
+                        "attr": 0,
+                        "text": "[doge]",
+                        "url": "https://i0.hdslb.com/bfs/emote/doge.png",
+                        "meta": {"size": 1},
+                        "mtime": 1668688325,
+                        "jump_title": "doge",
+                    }
+                },
+                "jump_url": {},
+                "max_line": 6,
+            },
+            "replies": None,
+            "up_action": {"like": False, "reply": False},
+            "reply_control": {"time_desc": "1天前发布", "location": "IP属地：上海"},
+        },
+        ensure_ascii=False,
+    )
+
+
+def measure(payloads, project) -> int:
+    """解析全部评论并以rpid为键保存，返回保存结果占用的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    comment_map = {}
+    for payload in payloads:
+        item = project(json.loads(payload))
+        comment_map[item["rpid"] if isinstance(item, dict) else item.rpid] = item
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del comment_map
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="对比原始评论字典与精简评论记录的内存占用"
+    )
+    parser.add_argument("--comments", type=int, default=100000, help="合成评论数量")
+    parser.add_argument("--users", type=int, default=20000, help="不同用户数量")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = [
+        make_raw_comment(rpid, rng.randint(1, args.users), rng)
+        for rpid in range(1, args.comments + 1)
+    ]
+
+    raw_bytes = measure(payloads, lambda raw: raw)
+    record_bytes = measure(payloads, CommentRecord.from_api)
+
+    print(f"评论数: {args.comments}，不同用户数: {args.users}")
+    print(f"{'表示方式':<16}{'总占用(MB)':>12}{'每条(字节)':>12}")
+    for name, total in (
+        ("原始接口字典", raw_bytes),
+        ("CommentRecord", record_bytes),
+    ):
+        print(f"{name:<16}{total / 1024 / 1024:>12.1f}{total / args.comments:>12.0f}")
+    print(f"节省: {(1 - record_bytes / raw_bytes) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+主评论分页引擎基准测试：对比 page_index 分页与游标分页
+
+只遍历主评论页（不抓取子评论），统计每种模式的总耗时、页数、
+重复/缺失的根评论数量，以及前后段页面的平均延迟，用于评估深度翻页的表现。
+缺失数为另一种模式获取到、而本模式没有获取到的根评论数；两种模式都遍历完全部页面
+（未被 --max-pages 截断）时才能准确反映漏抓的数量。
+
+用法:
+    python benchmarks/bench_pagination.py BV1xxxxxxxxx [BV1yyyyyyyyy ...] [--max-pages 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilibili_api import video  # noqa: E402
+
+from worker_crawler import BilibiliCommentCrawler  # noqa: E402
+
+
+async def walk_main_pages(
+    bv_id: str, pagination_mode: str, max_pages: int, credential_dir: str
+):
+    """遍历主评论页并收集统计信息"""
+    crawler = BilibiliCommentCrawler(credential_dir=credential_dir)
+    oid = video.Video(bvid=bv_id, credential=crawler.credential).get_aid()
+
+    seen = set()
+    duplicates = 0
+    page_latencies = []
+    started = time.perf_counter()
+    last = started
+
+    async for page_num, replies, _ in crawler._iter_main_pages(oid, pagination_mode):
+        now = time.perf_counter()
+        page_latencies.append(now - last)
+        last = now
+        for reply in replies:
+            if reply["rpid"] in seen:
+                duplicates += 1
+            seen.add(reply["rpid"])
+        if page_num >= max_pages:
+            break
+
+    elapsed = time.perf_counter() - started
+    tail = page_latencies[-10:] or [0.0]
+    head = page_latencies[:10] or [0.0]
+    return {
+        "mode": pagination_mode,
+        "pages": len(page_latencies),
+        "roots": len(seen),
+        "root_ids": seen,
+        "duplicates": duplicates,
+        "elapsed": elapsed,
+        "head_latency": sum(head) / len(head),
+        "tail_latency": sum(tail) / len(tail),
+        "rate_limit_wait": crawler.rate_limiter.stats()["wait_seconds"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="对比 page_index 与游标分页的主评论抓取性能"
+    )
+    parser.add_argument(
+        "bv_ids", nargs="+", help="待测试的BV号（建议选择评论很多的视频）"
+    )
+    parser.add_argument(
+        "--max-pages", type=int, default=200, help="每种模式最多遍历的页数"
+    )
+    parser.add_argument(
+        "--credential-dir",
+        default=os.path.join(
+            os.path.dirname(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            ),
+            "v1",
+            "bilibili_cookie_output",
+        ),
+        help="凭证目录",
+    )
+    args = parser.parse_args()
+
+    for bv_id in args.bv_ids:
+        print(f"\n=== {bv_id} ===")
+        print(
+            f"{'模式':<8}{'页数':>6}{'根评论':>8}{'重复':>6}{'缺失':>6}{'总耗时(s)':>11}{'前10页(s/页)':>14}{'后10页(s/页)':>14}{'限速等待(s)':>12}"
+        )
+        results = [
+            await walk_main_pages(bv_id, mode, args.max_pages, args.credential_dir)
+            for mode in ("page", "cursor")
+        ]
+        all_roots = set().union(*(stats["root_ids"] for stats in results))
+        for stats in results:
+            missing = len(all_roots - stats["root_ids"])
+            print(
+                f"{stats['mode']:<8}{stats['pages']:>6}{stats['roots']:>8}{stats['duplicates']:>6}{missing:>6}"
+                f"{stats['elapsed']:>11.2f}{stats['head_latency']:>14.3f}{stats['tail_latency']:>14.3f}"
+                f"{stats['rate_limit_wait']:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+结果文件随机访问基准测试：对比整体解析与通过索引文件读取前N个回复串
+
+用流式写入器生成一个合成结果文件（同时生成索引文件），然后分别：
+1. json.load 整个文件后按点赞数取前N个根评论树；
+2. 通过 ResultIndex 打开索引、按点赞数排序，只用 mmap 解码前N个根评论树。
+两种方式的结果会被校验一致。
+
+用法:
+    python benchmarks/bench_result_index.py [--comments 1000000] [--top 50] [--keep]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_writers import write_comment_trees  # noqa: E402
+from result_index import ResultIndex, index_path  # noqa: E402
+
+
+def make_trees(total: int, replies_per_root: int = 9, seed: int = 0):
+    """按评论ID倒序产出约 total 条评论组成的简化格式根评论树"""
+    rng = random.Random(seed)
+    roots = total // (replies_per_root + 1)
+    for i in range(roots, 0, -1):
+        root_id = i * 100
+        yield {
+            "评论ID": root_id,
+            "用户名": f"用户{rng.randint(1, 50000)}",
+            "评论内容": "根评论内容" * rng.randint(1, 20),
+            "点赞数": rng.randint(0, 100000),
+            "回复时间": "2024-01-01 12:00:00",
+            "父评论ID": 0,
+            "replies": [
+                {
+                    "评论ID": root_id + j,
+                    "用户名": f"用户{rng.randint(1, 50000)}",
+                    "评论内容": "回复内容" * rng.randint(1, 10),
+                    "点赞数": rng.randint(0, 100),
+                    "回复时间": "2024-01-01 12:00:00",
+                    "父评论ID": root_id,
+                    "replies": [],
+                }
+                for j in range(1, replies_per_root + 1)
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比整体解析与索引随机访问的耗时")
+    parser.add_argument("--comments", type=int, default=1000000, help="合成评论数量")
+    parser.add_argument(
+        "--top", type=int, default=50, help="读取点赞数最高的回复串数量"
+    )
+    parser.add_argument("--keep", action="store_true", help="保留生成的结果文件")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_result_index_")
+    path = os.path.join(tmp_dir, "bench_comments.json")
+    stats = write_comment_trees(path, make_trees(args.comments))
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(
+        f"结果文件: {path} ({size_mb:.1f} MB, {stats['roots']} 条根评论, {stats['total_comments']} 条评论)"
+    )
+
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        full = json.load(f)
+    full_top = sorted(full, key=lambda c: c["点赞数"], reverse=True)[: args.top]
+    full_seconds = time.perf_counter() - started
+    del full
+
+    started = time.perf_counter()
+    with ResultIndex.open(path) as index:
+        index_top = index.read_trees(index.sorted_positions("likes")[: args.top])
+    index_seconds = time.perf_counter() - started
+
+    assert index_top == full_top, "两种方式读取的结果不一致"
+    print(f"整体解析后取前 {args.top} 个: {full_seconds * 1000:.1f} ms")
+    print(f"通过索引读取前 {args.top} 个: {index_seconds * 1000:.1f} ms")
+    print(f"加速比: {full_seconds / index_seconds:.1f}x")
+
+    if not args.keep:
+        for p in (path, index_path(path)):
+            os.remove(p)
+        os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+评论树格式转换基准测试：对比旧的递归转换与当前的迭代转换
+
+生成指定数量的合成评论记录并挂载成评论树（大部分为两层，少量为多层楼中楼），
+分别用两种实现把所有根评论转换为输出格式，统计耗时，并校验两者输出一致。
+最后用一条很深的回复链验证迭代实现不受递归深度限制。
+
+用法:
+    python benchmarks/bench_transform.py [--comments 1000000] [--replies-per-root 9]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_records import CommentRecord  # noqa: E402
+from worker_crawler import BilibiliCommentCrawler, _format_ctime  # noqa: E402
+
+
+def legacy_transform(record: CommentRecord) -> dict:
+    """旧实现：每条评论递归一次，并单独调用 fromtimestamp/strftime"""
+    ctime = record.ctime
+    formatted_time = "未知时间"
+    if ctime and isinstance(ctime, (int, float)):
+        try:
+            dt = datetime.datetime.fromtimestamp(ctime)
+            formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            formatted_time = "未知时间"
+
+    parent_id = 0
+    if record.parent != 0:
+        parent_id = int(record.parent)
+    elif record.root != 0:
+        parent_id = int(record.root)
+
+    simplified_comment = {
+        "评论ID": int(record.rpid),
+        "用户名": str(record.uname),
+        "评论内容": str(record.message),
+        "点赞数": int(record.like),
+        "回复时间": formatted_time,
+        "父评论ID": parent_id,
+        "replies": [],
+    }
+    for reply in record.replies or ():
+        if isinstance(reply, CommentRecord):
+            simplified_comment["replies"].append(legacy_transform(reply))
+    return simplified_comment
+
+
+def build_trees(total: int, replies_per_root: int, seed: int = 0):
+    """生成约 total 条评论组成的评论树，返回根评论记录列表"""
+    rng = random.Random(seed)
+    base_ctime = 1700000000
+    trees = []
+    rpid = 0
+    while rpid < total:
+        rpid += 1
+        root = CommentRecord(
+            rpid, 0, 0, base_ctime + rpid // 3, rng.randint(0, 5000), "根用户", "根评论"
+        )
+        root.replies = []
+        trees.append(root)
+        thread = [root]
+        for _ in range(min(replies_per_root, total - rpid)):
+            rpid += 1
+            # 约一成回复是楼中楼，挂在本串已有的回复下
+            parent = rng.choice(thread) if rng.random() < 0.1 else root
+            reply = CommentRecord(
+                rpid,
+                parent.rpid,
+                root.rpid,
+                base_ctime + rpid // 3,
+                rng.randint(0, 100),
+                f"用户{rng.randint(1, 50000)}",
+                "回复内容",
+            )
+            if parent.replies is None:
+                parent.replies = []
+            parent.replies.append(reply)
+            thread.append(reply)
+    return trees
+
+
+def time_transform(transform, trees) -> float:
+    started = time.perf_counter()
+    for tree in trees:
+        transform(tree)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比递归与迭代评论树转换的耗时")
+    parser.add_argument("--comments", type=int, default=1000000, help="合成评论数量")
+    parser.add_argument(
+        "--replies-per-root", type=int, default=9, help="每个根评论下的回复数"
+    )
+    args = parser.parse_args()
+
+    crawler = BilibiliCommentCrawler(cookie_data={"sessdata": "benchmark"})
+    trees = build_trees(args.comments, args.replies_per_root)
+
+    sample = trees[:1000]
+    assert [legacy_transform(t) for t in sample] == [
+        crawler._transform_comment_to_simplified_format(t) for t in sample
+    ], "两种实现的输出不一致"
+
+    _format_ctime.cache_clear()
+    legacy_seconds = time_transform(legacy_transform, trees)
+    current_seconds = time_transform(
+        crawler._transform_comment_to_simplified_format, trees
+    )
+
+    print(f"评论数: {args.comments}，根评论数: {len(trees)}")
+    print(f"{'实现':<12}{'耗时(秒)':>10}{'评论/秒':>14}")
+    for name, seconds in (("递归(旧)", legacy_seconds), ("迭代(新)", current_seconds)):
+        print(f"{name:<12}{seconds:>10.2f}{args.comments / seconds:>14.0f}")
+    print(f"加速比: {legacy_seconds / current_seconds:.2f}x")
+    print(f"时间戳缓存: {_format_ctime.cache_info()}")
+
+    # 深层回复链：旧实现会超过递归深度限制
+    depth = sys.getrecursionlimit() * 2
+    chain_root = node = CommentRecord(1, 0, 0, 1700000000, 0, "用户", "楼主")
+    for i in range(2, depth + 2):
+        child = CommentRecord(i, node.rpid, 1, 1700000000, 0, "用户", "回复")
+        node.replies = [child]
+        node = child
+    try:
+        legacy_transform(chain_root)
+        legacy_result = "成功"
+    except RecursionError:
+        legacy_result = "RecursionError"
+    crawler._transform_comment_to_simplified_format(chain_root)
+    print(f"深度 {depth} 的回复链: 递归(旧) {legacy_result}，迭代(新) 成功")
+
+
+if __name__ == "__main__":
+    main()
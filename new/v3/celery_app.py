@@ -1,7 +1,17 @@
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    task_revoked,
+    worker_process_init,
+    worker_process_shutdown,
+)
 import os
-import asyncio
 from worker_crawler import crawl_bilibili_comments
+from http_pool import init_http_pool, close_http_pool, run_in_worker_loop
+from artifact_index import artifact_index
+from task_registry import task_registry
 
 # Celery 配置
 app = Celery('bilibili_crawler')
@@ -28,8 +38,64 @@ app.conf.update(
 )
 
 
+@worker_process_init.connect
+def setup_worker_http_pool(**kwargs):
+    """每个 worker 子进程启动时初始化一次共享连接池，供该进程处理的所有任务复用"""
+    init_http_pool()
+
+
+@worker_process_shutdown.connect
+def teardown_worker_http_pool(**kwargs):
+    """worker 子进程退出时关闭共享连接池"""
+    close_http_pool()
+
+
+# === 任务登记表：由信号在任务生命周期的各个阶段更新，状态查询无需广播 ===
+
+@before_task_publish.connect
+def register_submitted_task(sender=None, headers=None, body=None, **kwargs):
+    """任务消息发送前（在提交任务的进程中）登记为 PENDING"""
+    task_id = (headers or {}).get('id')
+    if not task_id:
+        return
+    bv_id = None
+    if sender == 'celery_app.crawl_comments_task':
+        args = body[0] if isinstance(body, (list, tuple)) and body else []
+        bv_id = args[0] if args else None
+    task_registry.mark_submitted(task_id, sender, bv_id)
+
+
+@task_prerun.connect
+def register_started_task(task_id=None, task=None, **kwargs):
+    """Worker 开始执行任务"""
+    task_registry.mark_started(task_id, getattr(task.request, 'hostname', None))
+
+
+@task_postrun.connect
+def register_finished_task(task_id=None, retval=None, state=None, **kwargs):
+    """
+    任务执行结束。爬取任务通过返回值中的 status 报告失败（Celery 状态仍为 SUCCESS），
+    登记表按实际结果记录为 FAILURE
+    """
+    if state == 'SUCCESS' and isinstance(retval, dict) and retval.get('status') == 'FAILURE':
+        task_registry.mark_finished(task_id, 'FAILURE', error=retval.get('error') or retval.get('message'))
+    elif state == 'SUCCESS':
+        result = retval.get('result', retval) if isinstance(retval, dict) else None
+        task_registry.mark_finished(task_id, 'SUCCESS', result=result)
+    else:
+        task_registry.mark_finished(task_id, state or 'FAILURE', error=str(retval) if retval is not None else None)
+
+
+@task_revoked.connect
+def register_revoked_task(request=None, **kwargs):
+    """任务被撤销"""
+    task_id = getattr(request, 'id', None)
+    if task_id:
+        task_registry.mark_finished(task_id, 'REVOKED', error='任务已被取消')
+
+
 @app.task(bind=True, name='celery_app.crawl_comments_task')
-def crawl_comments_task(self, bv_id, cookie_data, save_dir):
+def crawl_comments_task(self, bv_id, cookie_data, save_dir, options=None):
     """
     爬取B站评论的任务
     
@@ -38,6 +104,7 @@ def crawl_comments_task(self, bv_id, cookie_data, save_dir):
         bv_id: B站视频BV号
         cookie_data: Cookie数据字典
         save_dir: 保存目录
+        options: 爬取选项字典（如 pagination_mode），原样传递给爬虫
         
     Returns:
         爬取结果字典
@@ -48,6 +115,7 @@ def crawl_comments_task(self, bv_id, cookie_data, save_dir):
         print(f"🔍 [Celery] BV号: '{bv_id}' (类型: {type(bv_id)}, 长度: {len(bv_id)})")
         print(f"🔍 [Celery] Cookie数据类型: {type(cookie_data)}")
         print(f"🔍 [Celery] 保存目录: '{save_dir}'")
+        print(f"🔍 [Celery] 爬取选项: {options}")
         
         print(f"开始处理任务: BV号={bv_id}")
         print(f"Cookie数据: {cookie_data}")
@@ -64,24 +132,33 @@ def crawl_comments_task(self, bv_id, cookie_data, save_dir):
             current_dir = os.path.dirname(os.path.abspath(__file__))
             save_dir = os.path.join(current_dir, "output")
         
-        # 创建新的事件循环（因为 Celery worker 中可能没有运行的事件循环）
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        task_id = self.request.id
         
-        # 执行爬取任务
+        def report_progress(detail):
+            """
+            更新 Celery 任务状态和任务登记表中的进度
+            
+            由爬虫在线程中按间隔调用（self.request 是线程本地的，因此显式传入任务 ID），
+            不会阻塞爬取所在的事件循环
+            """
+            message = detail['message']
+            self.update_state(
+                task_id=task_id,
+                state='PROGRESS',
+                meta={'current': message, 'status': message, 'detail': detail}
+            )
+            task_registry.mark_progress(task_id, message, detail)
+        
+        # 执行爬取任务（在本进程共享的事件循环中运行，复用同一个连接池）
         print(f"🔍 [Celery] 即将传递给爬虫的BV号: '{bv_id}'")
-        result = loop.run_until_complete(
+        result = run_in_worker_loop(
             crawl_bilibili_comments(
                 bv_id=bv_id,
                 cookie_data=cookie_data,
                 save_dir=save_dir,
-                progress_callback=lambda message: self.update_state(
-                    state='PROGRESS',
-                    meta={'current': message, 'status': message}
-                )
+                progress_callback=report_progress,
+                task_id=task_id,
+                **(options or {})
             )
         )
         
@@ -101,6 +178,9 @@ def crawl_comments_task(self, bv_id, cookie_data, save_dir):
                 'message': f'爬取失败: {error_message}'
             }
         
+        # 记录结果文件，所有 API 进程都能据此提供下载
+        artifact_index.record(self.request.id, result)
+        
         # 任务完成，返回结果
         return {
             'status': 'SUCCESS',
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from celery import Celery
+
+# 刷新 Worker 状态快照的间隔（秒）
+CLUSTER_STATE_INTERVAL = float(os.getenv("CLUSTER_STATE_INTERVAL", "5"))
+# 每次 inspect 广播等待 Worker 回复的时长（秒）
+CLUSTER_INSPECT_TIMEOUT = float(os.getenv("CLUSTER_INSPECT_TIMEOUT", "1"))
+
+
+@dataclass(frozen=True)
+class ClusterSnapshot:
+    """
+    某一次刷新得到的 Worker 状态，创建后不再修改。
+    刷新时整体替换为新的对象，读取方持有同一个对象即可得到一致的 stats、active、registered
+    """
+
+    stats: Dict[str, Any] = field(default_factory=dict)
+    active: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    registered: Dict[str, List[str]] = field(default_factory=dict)
+    # 最近一次成功刷新的时间，尚未成功刷新过时为 None
+    refreshed_at: Optional[float] = None
+    # 最近一次刷新失败的原因，失败时保留上一次成功的数据
+    error: Optional[str] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """快照距今的秒数，尚未成功刷新过时为 None"""
+        if self.refreshed_at is None:
+            return None
+        return time.time() - self.refreshed_at
+
+    @property
+    def workers(self) -> List[str]:
+        return list(self.stats.keys())
+
+    def is_task_registered(self, task_name: str) -> bool:
+        """快照中是否有 Worker 注册了指定任务"""
+        return any(task_name in tasks for tasks in self.registered.values())
+
+
+class ClusterStateSnapshotter:
+    """
+    在后台定期通过 inspect 广播获取 Worker 状态（stats、active、registered），
+    保存为快照供接口直接读取，请求处理时不再发送广播。
+    读取方应先取出 snapshot，再从同一个快照对象中读取各项数据。
+    """
+
+    def __init__(
+        self,
+        celery_app: Celery,
+        interval: float = CLUSTER_STATE_INTERVAL,
+        inspect_timeout: float = CLUSTER_INSPECT_TIMEOUT,
+    ):
+        """
+        初始化快照器，调用 start 后开始刷新
+
+        Args:
+            celery_app: Celery 应用
+            interval: 刷新间隔（秒）
+            inspect_timeout: 每次广播等待回复的时长（秒）
+        """
+        self.celery_app = celery_app
+        self.interval = interval
+        self.inspect_timeout = inspect_timeout
+        self.snapshot = ClusterSnapshot()
+        self._task: Optional[asyncio.Task] = None
+
+    def refresh(self):
+        """同步刷新一次快照，会阻塞到所有广播返回，应在线程中调用"""
+        try:
+            inspect = self.celery_app.control.inspect(timeout=self.inspect_timeout)
+            stats = inspect.stats() or {}
+            active = inspect.active() or {}
+            registered = inspect.registered() or {}
+        except Exception as e:
+            # 保留上一次的数据，只记录错误
+            self.snapshot = replace(self.snapshot, error=str(e))
+            print(f"⚠️ 刷新 Worker 状态快照失败: {e}")
+            return
+        # 只替换一次引用，读取方拿到的要么是旧快照、要么是新快照
+        self.snapshot = ClusterSnapshot(stats, active, registered, time.time())
+
+    async def _run(self):
+        while True:
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """在当前事件循环中启动后台刷新"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台刷新"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
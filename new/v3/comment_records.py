@@ -0,0 +1,105 @@
+import sys
+from typing import Any, Dict, List, Optional, Union
+
+
+class CommentRecord:
+    """
+    精简的评论记录：只保存生成输出所需的七个字段，取代B站接口返回的完整评论字典
+    （头像、装扮、等级、表情映射等字段在输出中从不使用）。
+
+    使用 __slots__ 省去每个实例的 __dict__，用户名经过 sys.intern 驻留，
+    同一用户的多条评论共享同一个字符串对象。replies 在建树时才会按需创建。
+    """
+
+    __slots__ = (
+        "rpid",
+        "parent",
+        "root",
+        "ctime",
+        "like",
+        "uname",
+        "message",
+        "replies",
+    )
+
+    def __init__(
+        self,
+        rpid: int,
+        parent: int,
+        root: int,
+        ctime: int,
+        like: int,
+        uname: str,
+        message: str,
+    ):
+        self.rpid = rpid
+        self.parent = parent
+        self.root = root
+        self.ctime = ctime
+        self.like = like
+        self.uname = sys.intern(uname)
+        self.message = message
+        # 建树阶段挂载的子评论记录，没有回复时保持为 None
+        self.replies: Optional[List["CommentRecord"]] = None
+
+    @classmethod
+    def from_api(cls, comment_data: Dict[str, Any]) -> "CommentRecord":
+        """
+        从B站接口返回的原始评论数据中提取所需字段
+
+        Args:
+            comment_data: 原始的B站评论数据
+
+        Returns:
+            精简的评论记录
+        """
+        ctime = comment_data.get("ctime", 0)
+        if not isinstance(ctime, (int, float)):
+            ctime = 0
+
+        username = "未知用户"
+        member_info = comment_data.get("member", {})
+        if isinstance(member_info, dict):
+            username = member_info.get("uname", "未知用户")
+
+        content_text = ""
+        content_info = comment_data.get("content", {})
+        if isinstance(content_info, dict):
+            content_text = content_info.get("message", "")
+
+        return cls(
+            int(comment_data.get("rpid", 0)),
+            int(comment_data.get("parent", 0)),
+            int(comment_data.get("root", 0)),
+            ctime,
+            int(comment_data.get("like", 0)),
+            str(username),
+            str(content_text),
+        )
+
+    def to_row(self) -> List[Any]:
+        """转换为紧凑的列表形式，用于写入检查点和回复串缓存"""
+        return [
+            self.rpid,
+            self.parent,
+            self.root,
+            self.ctime,
+            self.like,
+            self.uname,
+            self.message,
+        ]
+
+    @classmethod
+    def from_row(cls, row: Union[List[Any], Dict[str, Any]]) -> "CommentRecord":
+        """
+        从 to_row 生成的列表恢复评论记录
+
+        Args:
+            row: 列表形式的评论记录；旧版本状态文件中字典形式的评论也可以直接读取
+
+        Returns:
+            精简的评论记录
+        """
+        if isinstance(row, dict):
+            return cls.from_api(row)
+        return cls(*row)
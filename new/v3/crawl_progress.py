@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from rate_limiter import AdaptiveRateLimiter
+
+# 两次写出进度之间的最短间隔（毫秒），期间的更新合并为一次
+PROGRESS_FLUSH_INTERVAL_MS = int(os.getenv("CRAWLER_PROGRESS_FLUSH_MS", "1000"))
+
+
+class CrawlProgress:
+    """
+    爬取进度计数器。爬虫在事件循环中只修改内存中的计数，不做任何 I/O；
+    计数发生变化后由后台任务在线程中调用回调写出快照，两次写出至少间隔 flush_interval，
+    期间的多次更新合并为一次，写出期间的更新会在下一次写出时带上，不会丢失。
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        rate_limiter: AdaptiveRateLimiter = None,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL_MS / 1000,
+    ):
+        """
+        初始化计数器
+
+        Args:
+            callback: 接收进度快照的函数，在线程中调用，可以执行阻塞的写入；为 None 时只计数
+            rate_limiter: 本次爬取使用的限速器，快照中的请求数和限速等待时间取自它
+            flush_interval: 两次调用 callback 之间的最短间隔（秒）
+        """
+        self.callback = callback
+        self.rate_limiter = rate_limiter
+        self.flush_interval = max(0.0, flush_interval)
+        self.message = ""
+        self.pages = 0
+        self.roots = 0
+        self.replies = 0
+        self.estimated_total: Optional[int] = None
+        self.started_at = time.time()
+        self._dirty = False
+        self._last_flush = float("-inf")
+        self._flusher: Optional[asyncio.Task] = None
+        # 置位后后台任务不再等待间隔，立即写出
+        self._flush_now = asyncio.Event()
+
+    def set_message(self, message: str):
+        """更新当前阶段的说明文字，可直接作为旧式的文本进度回调使用"""
+        self.message = message
+        self._changed()
+
+    def set_estimated_total(self, total: Optional[int]):
+        """设置预计评论总数（来自视频统计信息，可能与实际可获取的数量不同）"""
+        self.estimated_total = total
+        self._changed()
+
+    def add_page(self, roots: int, replies: int):
+        """
+        记录一页主评论处理完成
+
+        Args:
+            roots: 该页的根评论数
+            replies: 该页获取到的回复数
+        """
+        self.pages += 1
+        self.roots += roots
+        self.replies += replies
+        self._changed()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前进度，可直接 JSON 序列化"""
+        fetched = self.roots + self.replies
+        rate_stats = self.rate_limiter.stats() if self.rate_limiter else {}
+        percent = None
+        if self.estimated_total:
+            percent = min(100.0, round(fetched * 100 / self.estimated_total, 1))
+        return {
+            "message": self.message,
+            "pages": self.pages,
+            "roots": self.roots,
+            "replies": self.replies,
+            "fetched": fetched,
+            "estimated_total": self.estimated_total,
+            "percent": percent,
+            "requests": rate_stats.get("requests", 0),
+            "throttled": rate_stats.get("throttled", 0),
+            "rate_limited_seconds": rate_stats.get("wait_seconds", 0.0),
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+        }
+
+    def _changed(self):
+        if self.callback is None:
+            return
+        self._dirty = True
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._dirty:
+            delay = self._last_flush + self.flush_interval - time.monotonic()
+            if delay > 0 and not self._flush_now.is_set():
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            # 同一时间只有一个写出在进行，先后顺序与快照顺序一致
+            await asyncio.to_thread(self._write, self.snapshot())
+
+    def _write(self, detail: Dict[str, Any]):
+        try:
+            self.callback(detail)
+        except Exception as e:
+            # 进度写出失败不影响爬取
+            print(f"⚠️ 写出爬取进度失败: {e}")
+
+    async def aclose(self):
+        """
+        立即写出尚未写出的进度并等待写出完成。爬取结束前调用，
+        保证最后的进度先于任务结果写入，不会覆盖结束状态。
+        """
+        if self._flusher is None:
+            return
+        self._flush_now.set()
+        if self._flusher.done() and self._dirty:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+        await self._flusher
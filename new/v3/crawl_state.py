@@ -0,0 +1,587 @@
+import datetime
+import glob
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from comment_records import CommentRecord
+from result_index import ResultIndex, get_result_index
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，此时不接管其他任务的检查点
+    fcntl = None
+
+# 状态目录名，位于输出目录之下
+STATE_DIR_NAME = ".crawl_state"
+# 检查点每累计多少页写入一次磁盘
+DEFAULT_CHECKPOINT_INTERVAL = int(os.getenv("CRAWLER_CHECKPOINT_INTERVAL", "5"))
+# 超过该时长（秒）的其他任务检查点不再用于续爬
+CHECKPOINT_MAX_AGE = int(os.getenv("CRAWLER_CHECKPOINT_MAX_AGE", str(24 * 3600)))
+
+
+def _lock_path(path: str) -> str:
+    """返回检查点对应的锁文件路径"""
+    return f"{path}.lock"
+
+
+def _acquire_lock(path: str) -> Optional[int]:
+    """
+    以非阻塞方式获取检查点的文件锁。锁由持有它的进程占用，进程退出（包括被杀）后自动释放，
+    因此能获取到锁说明检查点的所属任务已不在运行
+
+    Args:
+        path: 检查点文件路径
+
+    Returns:
+        锁文件的描述符，锁已被其他进程持有时返回 None
+    """
+    fd = os.open(_lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is None:
+        return fd
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _release_lock(path: str, fd: int):
+    """释放检查点的文件锁；检查点已不存在时一并删除锁文件"""
+    if not os.path.exists(path):
+        try:
+            os.remove(_lock_path(path))
+        except FileNotFoundError:
+            pass
+    os.close(fd)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _resumable(
+    progress: Dict[str, Any], pagination_mode: str, stop_at_rpid: int
+) -> bool:
+    """
+    检查点是否可用于本次爬取：分页模式和增量停止位置都必须相同。
+    旧版本的检查点没有记录停止位置，无法确认，一律视为不可用
+    """
+    return (
+        progress["pagination_mode"] == pagination_mode
+        and progress["stop_at_rpid"] == stop_at_rpid
+    )
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+class CrawlStateStore:
+    """
+    爬取状态存储：为每个BV号保存一份小型状态记录（已见过的最大rpid、最新评论时间、
+    上次输出文件等），供增量爬取判断从哪里停止。状态以JSON文件保存在输出目录下。
+    """
+
+    def __init__(self, save_dir: str):
+        """
+        初始化状态存储
+
+        Args:
+            save_dir: 爬取结果的保存目录，状态文件保存在其下的 .crawl_state 目录中
+        """
+        self.state_dir = os.path.join(save_dir, STATE_DIR_NAME)
+
+    def _path(self, bv_id: str, suffix: str) -> str:
+        return os.path.join(self.state_dir, f"{bv_id}{suffix}")
+
+    def _read_json(self, path: str) -> Optional[Any]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取状态文件 '{path}' 失败，将忽略该文件。原因: {e}")
+            return None
+
+    def _write_json(self, path: str, data: Any):
+        """先写临时文件再原子替换，避免进程被杀时留下损坏的状态文件"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_video_state(self, bv_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取指定视频上一次爬取的状态
+
+        Args:
+            bv_id: B站视频BV号
+
+        Returns:
+            状态字典，不存在时返回 None
+        """
+        return self._read_json(self._path(bv_id, ".json"))
+
+    def save_video_state(
+        self,
+        bv_id: str,
+        max_rpid: int,
+        newest_ctime: int,
+        file_path: str,
+        total_comments: int,
+    ):
+        """
+        保存指定视频本次爬取后的状态
+
+        Args:
+            bv_id: B站视频BV号
+            max_rpid: 已获取的根评论中最大的rpid
+            newest_ctime: 已获取的根评论中最新的发布时间戳
+            file_path: 本次输出文件路径
+            total_comments: 输出文件中的评论总数
+        """
+        self._write_json(
+            self._path(bv_id, ".json"),
+            {
+                "bv_id": bv_id,
+                "max_rpid": max_rpid,
+                "newest_ctime": newest_ctime,
+                "file_path": file_path,
+                "total_comments": total_comments,
+                "updated_at": int(time.time()),
+            },
+        )
+
+    def load_thread_cache(self, bv_id: str) -> "ThreadFingerprintCache":
+        """
+        读取指定视频的回复串指纹缓存，并打开指纹对应的上次输出文件的索引
+
+        Args:
+            bv_id: B站视频BV号
+
+        Returns:
+            回复串指纹缓存；不存在、为旧版本格式，或上次的输出没有可用索引（如压缩输出）时返回空缓存
+        """
+        data = self._read_json(self._path(bv_id, "_threads.json"))
+        if not isinstance(data, dict) or "threads" not in data:
+            return ThreadFingerprintCache()
+        source = get_result_index(data["file_path"])
+        if source is None:
+            print("ℹ️ 上次的输出文件没有可用的索引，本次不复用回复串。")
+            return ThreadFingerprintCache()
+        return ThreadFingerprintCache(data["threads"], source)
+
+    def save_thread_cache(
+        self, bv_id: str, cache: "ThreadFingerprintCache", file_path: str
+    ):
+        """
+        保存指定视频的回复串指纹
+
+        Args:
+            bv_id: B站视频BV号
+            cache: 回复串指纹缓存
+            file_path: 本次的输出文件，下次复用的回复从该文件的索引中读取
+        """
+        self._write_json(
+            self._path(bv_id, "_threads.json"),
+            {"file_path": file_path, "threads": cache.threads},
+        )
+
+    def open_checkpoint(
+        self,
+        bv_id: str,
+        task_id: str,
+        pagination_mode: str,
+        stop_at_rpid: int = 0,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> Tuple[Optional["CrawlCheckpoint"], Optional[Dict[str, Any]]]:
+        """
+        打开指定任务的检查点，并查找可用于续爬的已有进度
+
+        优先使用同一任务ID的检查点（任务被重新投递）；找不到时使用同一视频、
+        同一分页模式下最近的其他任务检查点（任务被重新提交），并将其接管为本任务的检查点。
+        每个检查点由所属任务持有文件锁，仍在运行的任务的检查点不会被接管。
+
+        增量爬取的检查点只记录了新评论，且在遇到已有评论时停止翻页，
+        因此只有增量停止位置（stop_at_rpid）也相同的检查点才能续爬。
+
+        Args:
+            bv_id: B站视频BV号
+            task_id: 任务ID
+            pagination_mode: 本次爬取的分页模式，只有模式相同的检查点才能续爬
+            stop_at_rpid: 增量爬取时上次已见过的最大根评论rpid，完整爬取时为 0
+            interval: 每累计多少页写入一次磁盘
+
+        Returns:
+            (本任务的检查点, 可续爬的进度)，没有可用进度时第二项为 None；
+            同一任务ID的检查点正被另一个进程使用时两项均为 None，本次爬取不使用检查点
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(bv_id, f"_checkpoint_{task_id}.jsonl")
+        lock_fd = _acquire_lock(path)
+        if lock_fd is None:
+            print(
+                f"⚠️ 任务 {task_id} 的检查点正被另一个进程使用（任务可能仍在运行），本次不使用检查点。"
+            )
+            return None, None
+
+        if os.path.exists(path):
+            progress = CrawlCheckpoint.load(path)
+            if progress and _resumable(progress, pagination_mode, stop_at_rpid):
+                print(
+                    f"📌 找到检查点 '{os.path.basename(path)}'，"
+                    f"已完成 {progress['page']} 页、{len(progress['comments'])} 条评论，将从断点继续。"
+                )
+                return (
+                    CrawlCheckpoint(path, interval, lock_fd, has_pages=True),
+                    progress,
+                )
+        else:
+            progress = self._adopt_checkpoint(
+                bv_id, path, pagination_mode, stop_at_rpid
+            )
+            if progress:
+                return (
+                    CrawlCheckpoint(path, interval, lock_fd, has_pages=True),
+                    progress,
+                )
+
+        checkpoint = CrawlCheckpoint(path, interval, lock_fd)
+        checkpoint.start(bv_id, task_id, pagination_mode, stop_at_rpid)
+        return checkpoint, None
+
+    def _adopt_checkpoint(
+        self, bv_id: str, path: str, pagination_mode: str, stop_at_rpid: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按时间从新到旧查找同一视频下其他任务留下的检查点，接管第一个可用的。
+        只考虑所属任务已不在运行（能获取到文件锁）的检查点；其中已过期的，
+        以及没有任何已完成页面的检查点不能用于续爬，查找时直接删除。
+
+        Args:
+            bv_id: B站视频BV号
+            path: 本任务的检查点路径，接管的检查点会被移动到这里
+            pagination_mode: 本次爬取的分页模式
+            stop_at_rpid: 本次爬取的增量停止位置，完整爬取时为 0
+
+        Returns:
+            接管的检查点中的进度，没有可用检查点时返回 None
+        """
+        if fcntl is None:
+            return None
+        others = glob.glob(glob.escape(self._path(bv_id, "_checkpoint_")) + "*.jsonl")
+        for candidate in sorted(others, key=_mtime, reverse=True):
+            lock_fd = _acquire_lock(candidate)
+            if lock_fd is None:
+                # 所属任务仍在运行
+                continue
+            try:
+                if not os.path.exists(candidate):
+                    continue
+                if time.time() - _mtime(candidate) >= CHECKPOINT_MAX_AGE:
+                    print(f"🧹 删除过期的检查点 '{os.path.basename(candidate)}'")
+                    _remove(candidate)
+                    continue
+                progress = CrawlCheckpoint.load(candidate)
+                if not progress:
+                    _remove(candidate)
+                    continue
+                if not _resumable(progress, pagination_mode, stop_at_rpid):
+                    continue
+                os.replace(candidate, path)
+                print(
+                    f"📌 找到检查点 '{os.path.basename(candidate)}'，"
+                    f"已完成 {progress['page']} 页、{len(progress['comments'])} 条评论，将从断点继续。"
+                )
+                return progress
+            finally:
+                _release_lock(candidate, lock_fd)
+        return None
+
+
+class ThreadFingerprintCache:
+    """
+    回复串指纹缓存：以根评论rpid为键，只记录上次抓取时的回复数（rcount）和
+    最后一条回复的rpid。根评论的指纹未变化时，从上次输出文件的索引中读取该根评论树，
+    还原出全部回复，无需再请求子评论接口，也不必在状态文件中保存回复内容。
+    """
+
+    def __init__(
+        self,
+        threads: Optional[Dict[str, List[int]]] = None,
+        source: Optional[ResultIndex] = None,
+    ):
+        """
+        初始化缓存
+
+        Args:
+            threads: 从状态文件读取的指纹，键为字符串形式的根评论rpid，值为 [rcount, last_reply_rpid]
+            source: 指纹对应的上次输出文件的索引，为 None 时所有回复串都视为已变化
+        """
+        self.threads: Dict[str, List[int]] = threads or {}
+        self.source = source
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, root_comment: Dict[str, Any]) -> Optional[List[CommentRecord]]:
+        """
+        根据主评论页上的根评论判断其回复串是否变化
+
+        回复数不变，且根评论自带的预览回复都不晚于缓存中的最后一条回复时，视为未变化。
+
+        Args:
+            root_comment: 主评论页返回的原始根评论
+
+        Returns:
+            未变化时返回从上次输出中还原的回复记录，否则返回 None
+        """
+        rpid = root_comment["rpid"]
+        cached = self.threads.get(str(rpid))
+        position = None
+        if cached is not None and self.source is not None:
+            position = self.source.find(rpid)
+        if position is None or cached[0] != root_comment.get("rcount", 0):
+            self.misses += 1
+            return None
+
+        preview = root_comment.get("replies") or []
+        if any(r["rpid"] > cached[1] for r in preview):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return _tree_replies(self.source.read_tree(position))
+
+    def update(self, root_comment: Dict[str, Any], replies: List[CommentRecord]):
+        """
+        记录根评论最新的指纹
+
+        回复的父评论不在该回复串中时，这些回复会在建树时被修正为顶层评论，
+        无法从输出中的根评论树还原，此类回复串不记录指纹，下次仍会重新抓取。
+
+        Args:
+            root_comment: 主评论页返回的原始根评论
+            replies: 该根评论下抓取到的全部回复记录
+        """
+        key = str(root_comment["rpid"])
+        thread_ids = {root_comment["rpid"]}
+        thread_ids.update(r.rpid for r in replies)
+        if any(r.parent not in thread_ids for r in replies):
+            self.threads.pop(key, None)
+            return
+        self.threads[key] = [
+            root_comment.get("rcount", 0),
+            max((r.rpid for r in replies), default=0),
+        ]
+
+
+def _parse_formatted_time(formatted_time: str) -> int:
+    """把输出中的 "YYYY-MM-DD HH:MM:SS" 还原为时间戳，"未知时间" 还原为 0"""
+    try:
+        return int(
+            datetime.datetime.strptime(formatted_time, "%Y-%m-%d %H:%M:%S").timestamp()
+        )
+    except ValueError:
+        return 0
+
+
+def _tree_replies(tree: Dict[str, Any]) -> List[CommentRecord]:
+    """
+    把输出中简化格式的根评论树还原为回复记录列表（不含根评论）
+
+    按先序遍历产出，同一父评论下的回复保持原有顺序，重新建树后与原来的树一致。
+
+    Args:
+        tree: 简化格式的根评论树
+
+    Returns:
+        回复记录列表
+    """
+    root_id = tree["评论ID"]
+    records = []
+    stack = list(reversed(tree["replies"]))
+    while stack:
+        node = stack.pop()
+        records.append(
+            CommentRecord(
+                node["评论ID"],
+                node["父评论ID"],
+                root_id,
+                _parse_formatted_time(node["回复时间"]),
+                node["点赞数"],
+                node["用户名"],
+                node["评论内容"],
+            )
+        )
+        stack.extend(reversed(node["replies"]))
+    return records
+
+
+class CrawlCheckpoint:
+    """
+    爬取检查点：以追加写入的JSON Lines日志记录每个已完成的主评论页及其全部评论。
+    首行为任务信息，其后每行对应一页，包含继续翻页所需的位置。
+    进程被杀时最多丢失最后一次写盘之后的页面，未写完的末行在读取时会被忽略。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+        lock_fd: Optional[int] = None,
+        has_pages: bool = False,
+    ):
+        """
+        初始化检查点
+
+        Args:
+            path: 检查点文件路径
+            interval: 每累计多少页写入一次磁盘
+            lock_fd: 已持有的检查点文件锁，close 或 discard 时释放
+            has_pages: 文件中是否已有完成的页面（续爬时为 True）
+        """
+        self.path = path
+        self.interval = max(1, interval)
+        self.has_pages = has_pages
+        self._pending: List[Dict[str, Any]] = []
+        self._lock_fd = lock_fd
+
+    def start(
+        self, bv_id: str, task_id: str, pagination_mode: str, stop_at_rpid: int = 0
+    ):
+        """
+        创建新的检查点文件并写入任务信息
+
+        Args:
+            bv_id: B站视频BV号
+            task_id: 任务ID
+            pagination_mode: 分页模式
+            stop_at_rpid: 增量爬取的停止位置，完整爬取时为 0
+        """
+        header = {
+            "type": "header",
+            "bv_id": bv_id,
+            "task_id": task_id,
+            "pagination_mode": pagination_mode,
+            "stop_at_rpid": stop_at_rpid,
+            "created_at": int(time.time()),
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+    def record_page(
+        self,
+        page_num: int,
+        next_position: Any,
+        comments: List[List[Any]],
+        max_root_rpid: int,
+        newest_ctime: int,
+    ) -> bool:
+        """
+        记录一个已完成的主评论页。只在内存中累计，写盘由调用方调用 flush 完成，
+        以便在线程中执行，不阻塞事件循环
+
+        Args:
+            page_num: 页码
+            next_position: 继续翻页的位置（页码模式为下一页页码，游标模式为下一页偏移量）
+            comments: 该页的根评论及其全部回复（CommentRecord.to_row 生成的列表）
+            max_root_rpid: 截至该页的最大根评论rpid
+            newest_ctime: 截至该页的最新根评论时间戳
+
+        Returns:
+            bool: True表示已累计到 interval 页，应当调用 flush 写盘
+        """
+        entry = {
+            "type": "page",
+            "page": page_num,
+            "next": next_position,
+            "comments": comments,
+            "max_root_rpid": max_root_rpid,
+            "newest_ctime": newest_ctime,
+        }
+        self._pending.append(entry)
+        self.has_pages = True
+        return len(self._pending) >= self.interval
+
+    def flush(self):
+        """将累计的页面编码后追加写入磁盘并 fsync，会阻塞，应在线程中调用"""
+        if not self._pending:
+            return
+        lines = [json.dumps(entry, ensure_ascii=False) for entry in self._pending]
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+
+    def discard(self):
+        """爬取成功后删除检查点"""
+        self._pending = []
+        _remove(self.path)
+        self.close()
+
+    def close(self):
+        """
+        释放检查点的文件锁，之后其他任务可以接管该检查点。
+        还没有任何已完成页面的检查点（如获取视频信息时就失败）无法用于续爬，直接删除
+        """
+        if not self.has_pages:
+            _remove(self.path)
+        if self._lock_fd is not None:
+            _release_lock(self.path, self._lock_fd)
+            self._lock_fd = None
+
+    @staticmethod
+    def load(path: str) -> Optional[Dict[str, Any]]:
+        """
+        读取检查点中的进度
+
+        Args:
+            path: 检查点文件路径
+
+        Returns:
+            包含分页模式、增量停止位置、最后完成的页码、继续位置、已获取评论等信息的字典；
+            没有任何已完成页面时返回 None
+        """
+        header = None
+        progress = None
+        comments: List[Any] = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 进程被杀时可能留下未写完的末行
+                        break
+                    if entry.get("type") == "header":
+                        header = entry
+                    elif entry.get("type") == "page":
+                        comments.extend(entry["comments"])
+                        progress = entry
+        except OSError as e:
+            print(f"⚠️ 读取检查点 '{path}' 失败，将忽略该文件。原因: {e}")
+            return None
+
+        if header is None or progress is None:
+            return None
+        return {
+            "pagination_mode": header["pagination_mode"],
+            "stop_at_rpid": header.get("stop_at_rpid"),
+            "page": progress["page"],
+            "next": progress["next"],
+            "max_root_rpid": progress["max_root_rpid"],
+            "newest_ctime": progress["newest_ctime"],
+            "comments": comments,
+        }
@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, Sequence
+
+# 可选依赖：安装 pyarrow 时支持导出 Parquet
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 导出格式及对应的文件后缀
+EXPORT_SUFFIXES = {"ndjson": ".ndjson", "parquet": ".parquet", "sqlite": ".sqlite"}
+# 扁平行的字段，顺序即各格式中的列顺序
+ROW_FIELDS = (
+    "评论ID",
+    "父评论ID",
+    "根评论ID",
+    "用户名",
+    "点赞数",
+    "回复时间",
+    "评论内容",
+)
+# Parquet 每累计多少行写入一个行组
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("CRAWLER_PARQUET_ROW_GROUP_SIZE", "50000"))
+
+
+def iter_flat_rows(tree: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    把一棵简化格式的根评论树展开为扁平行，每条评论一行，按先序遍历顺序产出
+
+    Args:
+        tree: 简化格式的根评论树
+
+    Yields:
+        包含 ROW_FIELDS 各字段的字典
+    """
+    root_id = tree["评论ID"]
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield {
+            "评论ID": node["评论ID"],
+            "父评论ID": node["父评论ID"],
+            "根评论ID": root_id,
+            "用户名": node["用户名"],
+            "点赞数": node["点赞数"],
+            "回复时间": node["回复时间"],
+            "评论内容": node["评论内容"],
+        }
+        stack.extend(reversed(node["replies"]))
+
+
+class _ExportSink:
+    """导出器基类：先写入临时文件，关闭时原子替换为目标文件，出错时删除临时文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp_path = f"{path}.part"
+
+    def write(self, tree: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _finish(self):
+        """完成写入并关闭临时文件"""
+        raise NotImplementedError
+
+    def _discard(self):
+        """关闭临时文件，不保证内容完整"""
+        raise NotImplementedError
+
+    def close(self):
+        self._finish()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._discard()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class NdjsonSink(_ExportSink):
+    """NDJSON 导出：每行一条评论，便于流式消费"""
+
+    export_format = "ndjson"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+
+    def write(self, tree: Dict[str, Any]):
+        self._file.writelines(
+            json.dumps(row, ensure_ascii=False) + "\n" for row in iter_flat_rows(tree)
+        )
+
+    def _finish(self):
+        self._file.close()
+
+    def _discard(self):
+        self._file.close()
+
+
+class ParquetSink(_ExportSink):
+    """Parquet 导出：按列存储，用于分析；行数达到 PARQUET_ROW_GROUP_SIZE 时写入一个行组"""
+
+    export_format = "parquet"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._schema = pyarrow.schema(
+            [
+                ("评论ID", pyarrow.int64()),
+                ("父评论ID", pyarrow.int64()),
+                ("根评论ID", pyarrow.int64()),
+                ("用户名", pyarrow.string()),
+                ("点赞数", pyarrow.int64()),
+                ("回复时间", pyarrow.string()),
+                ("评论内容", pyarrow.string()),
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(
+            self._tmp_path, self._schema, compression="zstd"
+        )
+        self._columns: Dict[str, List[Any]] = {field: [] for field in ROW_FIELDS}
+        self._buffered = 0
+
+    def write(self, tree: Dict[str, Any]):
+        for row in iter_flat_rows(tree):
+            for field in ROW_FIELDS:
+                self._columns[field].append(row[field])
+            self._buffered += 1
+        if self._buffered >= PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        self._writer.write_table(
+            pyarrow.table(self._columns, schema=self._schema),
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+        )
+        self._columns = {field: [] for field in ROW_FIELDS}
+        self._buffered = 0
+
+    def _finish(self):
+        self._flush()
+        self._writer.close()
+
+    def _discard(self):
+        self._writer.close()
+
+
+class SqliteSink(_ExportSink):
+    """SQLite 导出：comments 表，每条评论一行，写完后在父评论、用户名、时间上建立索引"""
+
+    export_format = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._conn = sqlite3.connect(self._tmp_path)
+        # 临时文件写完才会替换为目标文件，无需日志和同步写盘
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute(
+            'CREATE TABLE comments ("评论ID" INTEGER PRIMARY KEY, "父评论ID" INTEGER, '
+            '"根评论ID" INTEGER, "用户名" TEXT, "点赞数" INTEGER, "回复时间" TEXT, "评论内容" TEXT)'
+        )
+        self._insert_sql = "INSERT OR REPLACE INTO comments VALUES ({})".format(
+            ", ".join("?" * len(ROW_FIELDS))
+        )
+
+    def write(self, tree: Dict[str, Any]):
+        self._conn.executemany(
+            self._insert_sql,
+            (tuple(row[field] for field in ROW_FIELDS) for row in iter_flat_rows(tree)),
+        )
+
+    def _finish(self):
+        # 数据全部写入后再建索引，比逐行维护索引快得多
+        self._conn.executescript(
+            'CREATE INDEX idx_comments_parent ON comments ("父评论ID");'
+            'CREATE INDEX idx_comments_user ON comments ("用户名");'
+            'CREATE INDEX idx_comments_time ON comments ("回复时间");'
+        )
+        self._conn.commit()
+        self._conn.close()
+
+    def _discard(self):
+        self._conn.close()
+
+
+_SINK_CLASSES = {"ndjson": NdjsonSink, "parquet": ParquetSink, "sqlite": SqliteSink}
+
+
+def open_export_sinks(
+    base_path: str, export_formats: Sequence[str]
+) -> List[_ExportSink]:
+    """
+    按导出格式创建导出器；未安装 pyarrow 时跳过 Parquet
+
+    Args:
+        base_path: 不含后缀的目标文件路径，各格式在其后追加对应后缀
+        export_formats: 导出格式列表，可包含 "ndjson"、"parquet"、"sqlite"
+
+    Returns:
+        导出器列表
+    """
+    sinks = []
+    try:
+        for export_format in dict.fromkeys(export_formats):
+            if export_format not in _SINK_CLASSES:
+                raise ValueError(f"不支持的导出格式: {export_format}")
+            if export_format == "parquet" and pyarrow is None:
+                print("⚠️ 未安装 pyarrow，跳过 Parquet 导出。")
+                continue
+            sinks.append(
+                _SINK_CLASSES[export_format](base_path + EXPORT_SUFFIXES[export_format])
+            )
+    except Exception:
+        for sink in sinks:
+            sink.abort()
+        raise
+    return sinks
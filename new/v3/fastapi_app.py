@@ -1,21 +1,55 @@
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, Response  # 添加 Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse  # 添加 Response
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from celery_app import app as celery_app
+from artifact_index import artifact_index
+from cluster_state import ClusterStateSnapshotter
+from task_registry import task_registry
 from models import CrawlRequest, CrawlResponse, TaskStatusResponse, TaskStatus, TaskResult
+from models import BatchStatusRequest, BatchStatusResponse
+from models import CommentPageResponse, CommentSort, DownloadFormat, ReplyPageResponse, SortOrder
+from output_writers import READ_CHUNK_SIZE, artifact_content_encoding, iter_artifact_chunks, precompressed_siblings, strip_compression_suffix
+from result_converters import CONVERT_FORMATS, iter_converted
+from result_index import ResultIndex, get_result_index
+import functools
+import hashlib
+import asyncio
 import os
+import redis
 import time
 import traceback
 import uvicorn
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from urllib.parse import quote
 
+# 任务事件流在没有更新时发送心跳的间隔（秒），避免连接被代理判定为空闲而断开
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# 任务结束的状态，事件流发送这些状态后关闭
+TERMINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED', 'ERROR')
+
+# Worker 状态快照，由后台任务定期刷新，接口直接读取，不再在请求中发送 inspect 广播
+cluster_state = ClusterStateSnapshotter(celery_app)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时开始刷新 Worker 状态快照，退出时停止刷新并关闭 Redis 连接"""
+    cluster_state.start()
+    yield
+    await cluster_state.stop()
+    await artifact_index.aclose()
+    await task_registry.aclose()
+
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="B站评论爬虫 API",
     description="基于 FastAPI 和 Celery 的 B站视频评论爬虫服务",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # 添加 CORS 中间件
@@ -25,7 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],  # 明确暴露 Content-Disposition 头
+    expose_headers=["Content-Disposition", "ETag", "Content-Range"],  # 明确暴露下载相关的响应头
 )
 
 # 创建输出目录
@@ -35,8 +69,8 @@ os.makedirs(output_dir, exist_ok=True)
 # 挂载静态文件服务（用于文件下载）
 app.mount("/files", StaticFiles(directory=output_dir), name="files")
 
-# 存储任务ID与文件路径的映射
-task_file_mapping: Dict[str, str] = {}
+# 缓存的结果文件 ETag 数量上限
+ETAG_CACHE_SIZE = int(os.getenv("DOWNLOAD_ETAG_CACHE_SIZE", "256"))
 
 
 @app.get("/")
@@ -50,7 +84,11 @@ async def root():
         "endpoints": {
             "crawl": "POST /api/crawl",
             "status": "GET /api/status/{task_id}",
+            "status_batch": "POST /api/status:batch",
+            "events": "GET /api/events/{task_id}",
             "download": "GET /api/download/{task_id}",
+            "comments": "GET /api/results/{task_id}/comments",
+            "replies": "GET /api/results/{task_id}/comments/{root_id}/replies",
             "health": "GET /api/health"
         }
     }
@@ -92,56 +130,45 @@ async def submit_crawl_task(request: CrawlRequest):
         # 设置保存目录
         save_dir = output_dir
         
+        # 爬取选项，原样传递给爬虫
+        crawl_options = {
+            "pagination_mode": request.pagination_mode.value,
+            "incremental": request.incremental,
+            "reuse_unchanged_threads": request.reuse_unchanged_threads,
+            "output_format": request.output_format.value,
+            "output_compression": request.output_compression.value,
+            "export_formats": [f.value for f in request.export_formats],
+        }
+        
         # === 添加 Celery 连接和任务提交检查 ===
         print("=== Celery 任务提交检查 ===")
         
-        # 1. 检查 Celery 连接
-        try:
-            inspect = celery_app.control.inspect()
-            active_workers = inspect.active()
-            registered_tasks = inspect.registered()
-            
-            print(f"🔍 活跃 Workers: {list(active_workers.keys()) if active_workers else '无'}")
-            print(f"🔍 注册的任务: {registered_tasks}")
-            
-            # 2. 检查任务是否注册
-            task_name = 'celery_app.crawl_comments_task'
-            task_registered = False
-            if registered_tasks:
-                for worker, tasks in registered_tasks.items():
-                    if task_name in tasks:
-                        task_registered = True
-                        print(f"✅ 任务 '{task_name}' 已在 Worker '{worker}' 中注册")
-                        break
-            
-            if not task_registered:
-                print(f"❌ 任务 '{task_name}' 未注册！")
-                print("💡 请检查 Celery Worker 是否正确启动并加载了任务")
-                
-        except Exception as inspect_error:
-            print(f"❌ Celery 连接检查失败: {inspect_error}")
+        # 1. 根据 Worker 状态快照检查任务是否注册（只用于日志提示，不阻塞提交）
+        task_name = 'celery_app.crawl_comments_task'
+        snapshot = cluster_state.snapshot
+        print(f"🔍 活跃 Workers: {snapshot.workers or '无'}")
+        if snapshot.refreshed_at is not None and not snapshot.is_task_registered(task_name):
+            print(f"❌ 任务 '{task_name}' 未注册！")
+            print("💡 请检查 Celery Worker 是否正确启动并加载了任务")
         
-        # 3. 提交任务到 Celery
+        # 2. 提交任务到 Celery
         print(f"📤 提交任务参数:")
         print(f"   - BV号: '{bv_id}' (长度: {len(bv_id)})")
         print(f"   - Cookie数据: {len(cookie_data)} 个字段")
         print(f"   - 保存目录: {save_dir}")
+        print(f"   - 爬取选项: {crawl_options}")
         print(f"🔍 [FastAPI] 即将发送给Celery的BV号: '{bv_id}'")
         
-        task = celery_app.send_task(
-            'celery_app.crawl_comments_task',
-            args=[bv_id, cookie_data, save_dir]
+        # 发送消息会访问 broker，在线程池中执行，不阻塞事件循环
+        task = await run_in_threadpool(
+            celery_app.send_task,
+            task_name,
+            args=[bv_id, cookie_data, save_dir],
+            kwargs={"options": crawl_options}
             # 移除 queue 参数，使用默认队列
         )
         
         print(f"✅ 任务已提交: {task.id}")
-        print(f"🔍 任务状态: {task.state}")
-        
-        # 4. 立即检查任务是否被接收
-        import time
-        time.sleep(0.5)  # 等待0.5秒
-        updated_status = task.state
-        print(f"🔍 0.5秒后任务状态: {updated_status}")
         
         # 构建状态查询URL
         status_url = f"/api/status/{task.id}"
@@ -161,40 +188,238 @@ async def submit_crawl_task(request: CrawlRequest):
         )
 
 
-@app.get("/api/status/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str, request: Request):
+def read_celery_task_state(task_id: str) -> Tuple[str, Any, Any]:
     """
-    查询任务状态
+    从 Celery 结果后端读取任务状态，任务登记表中没有记录时使用（如登记表上线前提交的任务）
     
     Args:
         task_id: 任务 ID
-        request: FastAPI请求对象
         
     Returns:
-        任务状态和结果
+        (状态, 任务信息, 任务结果)，读取失败的部分分别为 'UNKNOWN'、None、None
     """
+    task_result = celery_app.AsyncResult(task_id)
+    
+    # 安全地获取任务状态
     try:
-        # 从 Celery 获取任务结果
-        task_result = celery_app.AsyncResult(task_id)
+        status = task_result.state
+    except Exception as e:
+        print(f"❌ 获取任务状态失败: {str(e)}")
+        status = 'UNKNOWN'
+    
+    try:
+        task_info = task_result.info
+    except Exception as e:
+        print(f"❌ 获取任务信息失败: {str(e)}")
+        task_info = None
+    
+    try:
+        task_result_data = task_result.result
+    except Exception as e:
+        print(f"❌ 获取任务结果失败: {str(e)}")
+        task_result_data = None
+    
+    return status, task_info, task_result_data
+
+
+def registry_task_state(record: Dict[str, Any]) -> Tuple[str, Any, Any]:
+    """
+    把任务登记记录转换为与 Celery 结果后端相同的 (状态, 任务信息, 任务结果) 形式
+    
+    Args:
+        record: 任务登记记录
         
-        # 安全地获取任务状态
+    Returns:
+        (状态, 任务信息, 任务结果)
+    """
+    status = record.get('status', 'PENDING')
+    task_info = None
+    if record.get('progress'):
+        task_info = {'status': record['progress'], 'detail': record.get('progress_detail')}
+    task_result_data = None
+    if status == 'SUCCESS':
+        task_result_data = {'status': 'SUCCESS', 'result': record.get('result') or {}}
+    elif status in ('FAILURE', 'REVOKED'):
+        task_result_data = {'error': record.get('error') or '任务执行失败'}
+    return status, task_info, task_result_data
+
+
+def build_task_status_response(
+    task_id: str,
+    status: str,
+    task_info: Any,
+    task_result_data: Any,
+    request: Request
+) -> TaskStatusResponse:
+    """
+    根据任务状态、任务信息和任务结果构建状态响应
+    
+    Args:
+        task_id: 任务 ID
+        status: 任务状态
+        task_info: 任务信息（进行中时包含进度）
+        task_result_data: 任务结果（成功时为爬取结果，失败时包含错误信息）
+        request: FastAPI请求对象，用于生成完整的下载地址
+        
+    Returns:
+        任务状态响应
+    """
+    # 准备响应数据
+    response_data = {
+        "task_id": task_id,
+        "status": status,
+        "result": None,
+        "progress": None,
+        "progress_detail": None,
+        "error": None,
+        "download_url": None
+    }
+    
+    if status == 'PENDING':
+        # 任务等待中 - 增加更详细的状态信息
+        response_data["progress"] = "等待处理..."
+        
+        # 检查任务是否长时间停留在PENDING状态
         try:
-            status = task_result.state
-        except Exception as e:
-            print(f"❌ 获取任务状态失败: {str(e)}")
-            status = 'UNKNOWN'
+            # 简单的时间检查逻辑（由于缺少准确的任务提交时间，暂时简化处理）
+            response_data["progress"] = "等待处理... (如果长时间无响应，请检查Worker是否正常运行)"
+        except Exception:
+            pass
+        
+    elif status == 'STARTED':
+        # 任务已开始
+        meta = task_info or {}
+        response_data["progress"] = meta.get('status', '任务已开始...')
         
+    elif status == 'PROGRESS':
+        # 任务进行中
+        meta = task_info or {}
+        response_data["progress"] = meta.get('status', '处理中...')
+        response_data["progress_detail"] = meta.get('detail')
+        
+    elif status == 'SUCCESS':
+        # 任务成功完成
+        result = task_result_data
         try:
-            task_info = task_result.info
-        except Exception as e:
-            print(f"❌ 获取任务信息失败: {str(e)}")
-            task_info = None
+            if isinstance(result, dict):
+                # 处理直接的任务结果
+                if 'result' in result:
+                    task_result_content = result['result']
+                else:
+                    # 如果没有嵌套的result字段，直接使用整个result
+                    task_result_content = result
+                
+                # 安全地获取文件路径
+                file_path = task_result_content.get('file_path')
+                download_url = None
+                
+                if file_path and os.path.exists(file_path):
+                    # 生成下载URL
+                    download_url = f"/api/download/{task_id}"
+                    # 构建完整的文件URL
+                    base_url = f"{request.url.scheme}://{request.url.netloc}"
+                    file_url = f"{base_url}{download_url}"
+                    task_result_content['file_url'] = file_url
+                
+                # 安全地创建TaskResult对象
+                try:
+                    response_data["result"] = TaskResult(**task_result_content)
+                except Exception as model_error:
+                    print(f"❌ 创建TaskResult对象失败: {model_error}")
+                    # 如果模型创建失败，创建一个基本的结果对象
+                    response_data["result"] = TaskResult(
+                        file_path=task_result_content.get('file_path'),
+                        video_title=task_result_content.get('video_title', '未知标题'),
+                        bv_id=task_result_content.get('bv_id'),
+                        total_comments=task_result_content.get('total_comments', 0),
+                        independent_comments=task_result_content.get('independent_comments', 0)
+                    )
+                
+                response_data["progress"] = "100% - 完成"
+                response_data["download_url"] = download_url
+            else:
+                # 如果result不是字典，创建基本响应
+                response_data["result"] = None
+                response_data["progress"] = "100% - 完成（结果格式异常）"
+                
+        except Exception as success_error:
+            print(f"❌ 处理SUCCESS状态时出错: {success_error}")
+            response_data["result"] = None
+            response_data["progress"] = "100% - 完成（处理结果时出错）"
+            response_data["error"] = f"处理成功结果时出错: {str(success_error)}"
+            
+    elif status == 'FAILURE':
+        # 任务失败 - 安全处理异常信息
+        error_message = "任务执行失败"
         
         try:
-            task_result_data = task_result.result
+            # 优先从任务结果中获取错误信息
+            if task_result_data and isinstance(task_result_data, dict):
+                if 'error' in task_result_data:
+                    error_message = task_result_data['error']
+                elif 'message' in task_result_data:
+                    error_message = task_result_data['message']
+            # 备选：从任务信息中获取错误信息
+            elif task_info and isinstance(task_info, dict):
+                error_message = task_info.get('error', error_message)
+                if not error_message or error_message == "":
+                    error_message = "任务执行过程中发生未知错误"
+            elif task_info and isinstance(task_info, str):
+                error_message = task_info
+            # 如果是异常对象，尝试获取异常信息
+            elif task_result_data and hasattr(task_result_data, 'args'):
+                error_message = str(task_result_data)
         except Exception as e:
-            print(f"❌ 获取任务结果失败: {str(e)}")
-            task_result_data = None
+            print(f"❌ 处理错误信息时出错: {str(e)}")
+            error_message = "任务执行失败，无法获取详细错误信息"
+        
+        response_data["error"] = error_message
+        response_data["progress"] = "任务失败"
+    
+    elif status == 'UNKNOWN':
+        # 未知状态 - 可能是异常导致的
+        response_data["progress"] = "状态未知"
+        response_data["error"] = "任务状态异常，可能需要重新提交"
+            
+    elif status == 'REVOKED':
+        # 任务已被取消
+        response_data["progress"] = "任务已取消"
+        if isinstance(task_result_data, dict):
+            response_data["error"] = task_result_data.get('error')
+        
+    elif status == 'RETRY':
+        # 任务重试中
+        response_data["progress"] = "重试中..."
+        
+    else:
+        # 其他状态
+        response_data["progress"] = f"状态: {status}"
+    
+    return TaskStatusResponse(**response_data)
+
+
+async def resolve_task_status(
+    task_id: str,
+    record: Optional[Dict[str, Any]],
+    request: Request
+) -> TaskStatusResponse:
+    """
+    根据任务登记记录构建状态响应，没有记录时回退到 Celery 结果后端
+    
+    Args:
+        task_id: 任务 ID
+        record: 任务登记记录，登记表中没有该任务时为 None
+        request: FastAPI请求对象
+        
+    Returns:
+        任务状态响应，出错时返回 ERROR 状态而不抛出异常
+    """
+    try:
+        if record:
+            status, task_info, task_result_data = registry_task_state(record)
+        else:
+            # AsyncResult 的读取是阻塞的，在线程池中执行
+            status, task_info, task_result_data = await run_in_threadpool(read_celery_task_state, task_id)
         
         # 如果所有信息都获取失败，返回安全的错误状态
         if status == 'UNKNOWN' and task_info is None and task_result_data is None:
@@ -207,170 +432,10 @@ async def get_task_status(task_id: str, request: Request):
                 download_url=None
             )
         
-        # === 添加详细的任务状态检查 ===
         print(f"=== 查询任务状态: {task_id} ===")
-        print(f"🔍 任务状态: {status}")
-        print(f"🔍 任务信息: {task_info}")
-        print(f"🔍 任务结果: {task_result_data}")
-        
-        # 检查任务是否在队列中
-        try:
-            inspect = celery_app.control.inspect()
-            active_tasks = inspect.active()
-            reserved_tasks = inspect.reserved()
-            scheduled_tasks = inspect.scheduled()
-            
-            print(f"🔍 活跃任务数: {sum(len(tasks) for tasks in active_tasks.values()) if active_tasks else 0}")
-            print(f"🔍 保留任务数: {sum(len(tasks) for tasks in reserved_tasks.values()) if reserved_tasks else 0}")
-            print(f"🔍 计划任务数: {sum(len(tasks) for tasks in scheduled_tasks.values()) if scheduled_tasks else 0}")
-            
-            # 检查当前任务是否在这些列表中
-            task_found = False
-            for task_list_name, task_list in [
-                ("活跃", active_tasks), 
-                ("保留", reserved_tasks), 
-                ("计划", scheduled_tasks)
-            ]:
-                if task_list:
-                    for worker, tasks in task_list.items():
-                        for task in tasks:
-                            if task.get('id') == task_id:
-                                print(f"✅ 任务在 {task_list_name} 列表中，Worker: {worker}")
-                                task_found = True
-                                break
-            
-            if not task_found and status == 'PENDING':
-                print("❌ 任务状态为 PENDING 但未在任何队列中找到，可能存在路由问题")
-                
-        except Exception as inspect_error:
-            print(f"❌ 任务队列检查失败: {inspect_error}")
-        
-        # 准备响应数据
-        response_data = {
-            "task_id": task_id,
-            "status": status,
-            "result": None,
-            "progress": None,
-            "error": None,
-            "download_url": None
-        }
-        
-        if status == 'PENDING':
-            # 任务等待中 - 增加更详细的状态信息
-            response_data["progress"] = "等待处理..."
-            
-            # 检查任务是否长时间停留在PENDING状态
-            try:
-                # 简单的时间检查逻辑（由于缺少准确的任务提交时间，暂时简化处理）
-                response_data["progress"] = "等待处理... (如果长时间无响应，请检查Worker是否正常运行)"
-            except Exception:
-                pass
-            
-        elif status == 'STARTED':
-            # 任务已开始
-            meta = task_info or {}
-            response_data["progress"] = meta.get('status', '任务已开始...')
-            
-        elif status == 'PROGRESS':
-            # 任务进行中
-            meta = task_info or {}
-            response_data["progress"] = meta.get('status', '处理中...')
-            
-        elif status == 'SUCCESS':
-            # 任务成功完成
-            result = task_result_data
-            try:
-                if isinstance(result, dict):
-                    # 处理直接的任务结果
-                    if 'result' in result:
-                        task_result_content = result['result']
-                    else:
-                        # 如果没有嵌套的result字段，直接使用整个result
-                        task_result_content = result
-                    
-                    # 安全地获取文件路径
-                    file_path = task_result_content.get('file_path')
-                    download_url = None
-                    
-                    if file_path and os.path.exists(file_path):
-                        # 存储任务ID与文件路径的映射
-                        task_file_mapping[task_id] = file_path
-                        # 生成下载URL
-                        download_url = f"/api/download/{task_id}"
-                        # 构建完整的文件URL
-                        base_url = f"{request.url.scheme}://{request.url.netloc}"
-                        file_url = f"{base_url}{download_url}"
-                        task_result_content['file_url'] = file_url
-                    
-                    # 安全地创建TaskResult对象
-                    try:
-                        response_data["result"] = TaskResult(**task_result_content)
-                    except Exception as model_error:
-                        print(f"❌ 创建TaskResult对象失败: {model_error}")
-                        # 如果模型创建失败，创建一个基本的结果对象
-                        response_data["result"] = TaskResult(
-                            file_path=task_result_content.get('file_path'),
-                            video_title=task_result_content.get('video_title', '未知标题'),
-                            bv_id=task_result_content.get('bv_id'),
-                            total_comments=task_result_content.get('total_comments', 0),
-                            independent_comments=task_result_content.get('independent_comments', 0)
-                        )
-                    
-                    response_data["progress"] = "100% - 完成"
-                    response_data["download_url"] = download_url
-                else:
-                    # 如果result不是字典，创建基本响应
-                    response_data["result"] = None
-                    response_data["progress"] = "100% - 完成（结果格式异常）"
-                    
-            except Exception as success_error:
-                print(f"❌ 处理SUCCESS状态时出错: {success_error}")
-                response_data["result"] = None
-                response_data["progress"] = "100% - 完成（处理结果时出错）"
-                response_data["error"] = f"处理成功结果时出错: {str(success_error)}"
-                
-        elif status == 'FAILURE':
-            # 任务失败 - 安全处理异常信息
-            error_message = "任务执行失败"
-            
-            try:
-                # 优先从任务结果中获取错误信息
-                if task_result_data and isinstance(task_result_data, dict):
-                    if 'error' in task_result_data:
-                        error_message = task_result_data['error']
-                    elif 'message' in task_result_data:
-                        error_message = task_result_data['message']
-                # 备选：从任务信息中获取错误信息
-                elif task_info and isinstance(task_info, dict):
-                    error_message = task_info.get('error', error_message)
-                    if not error_message or error_message == "":
-                        error_message = "任务执行过程中发生未知错误"
-                elif task_info and isinstance(task_info, str):
-                    error_message = task_info
-                # 如果是异常对象，尝试获取异常信息
-                elif task_result_data and hasattr(task_result_data, 'args'):
-                    error_message = str(task_result_data)
-            except Exception as e:
-                print(f"❌ 处理错误信息时出错: {str(e)}")
-                error_message = "任务执行失败，无法获取详细错误信息"
-            
-            response_data["error"] = error_message
-            response_data["progress"] = "任务失败"
-        
-        elif status == 'UNKNOWN':
-            # 未知状态 - 可能是异常导致的
-            response_data["progress"] = "状态未知"
-            response_data["error"] = "任务状态异常，可能需要重新提交"
-                
-        elif status == 'RETRY':
-            # 任务重试中
-            response_data["progress"] = "重试中..."
-            
-        else:
-            # 其他状态
-            response_data["progress"] = f"状态: {status}"
+        print(f"🔍 任务状态: {status} ({'登记表' if record else 'Celery 结果后端'})")
         
-        return TaskStatusResponse(**response_data)
+        return build_task_status_response(task_id, status, task_info, task_result_data, request)
         
     except Exception as e:
         error_details = traceback.format_exc()
@@ -390,13 +455,221 @@ async def get_task_status(task_id: str, request: Request):
         )
 
 
+@app.get("/api/status/{task_id}", response_model=TaskStatusResponse)
+async def get_task_status(task_id: str, request: Request):
+    """
+    查询任务状态
+    
+    优先读取任务登记表（一次 Redis 读取），没有记录时回退到 Celery 结果后端。
+    
+    Args:
+        task_id: 任务 ID
+        request: FastAPI请求对象
+        
+    Returns:
+        任务状态和结果
+    """
+    record = await task_registry.aget(task_id)
+    return await resolve_task_status(task_id, record, request)
+
+
+@app.post("/api/status:batch", response_model=BatchStatusResponse)
+async def get_task_statuses(batch: BatchStatusRequest, request: Request):
+    """
+    批量查询任务状态
+    
+    所有任务的登记记录通过一次 Redis 往返读取；登记表中没有的任务并发回退到 Celery 结果后端。
+    
+    Args:
+        batch: 包含任务 ID 列表的请求体
+        request: FastAPI请求对象
+        
+    Returns:
+        与请求顺序一致的任务状态列表
+    """
+    records = await task_registry.aget_many(batch.task_ids)
+    tasks = await asyncio.gather(*(
+        resolve_task_status(task_id, record, request)
+        for task_id, record in zip(batch.task_ids, records)
+    ))
+    return BatchStatusResponse(tasks=list(tasks))
+
+
+@app.get("/api/events/{task_id}")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    以 Server-Sent Events 推送任务状态，替代轮询 /api/status
+    
+    每条事件的 data 与 /api/status 的响应相同：连接建立后立即发送当前状态，
+    之后任务每次更新发送一次，任务结束时发送最终状态并关闭连接。
+    Redis 不可用时返回 503，客户端应回退为轮询。
+    
+    Args:
+        task_id: 任务 ID
+        request: FastAPI请求对象，用于检测客户端断开
+        
+    Returns:
+        text/event-stream 流式响应
+    """
+    watcher = task_registry.awatch(task_id, SSE_HEARTBEAT_SECONDS)
+    try:
+        record = await anext(watcher)
+    except redis.RedisError as e:
+        await watcher.aclose()
+        print(f"❌ 订阅任务 {task_id} 的事件失败: {e}")
+        raise HTTPException(status_code=503, detail="任务事件推送暂不可用，请改用 /api/status 轮询")
+    
+    async def event_stream():
+        nonlocal record
+        try:
+            while True:
+                if record is None:
+                    # 一段时间没有更新：发送注释行作为心跳，并检查客户端是否已断开
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                else:
+                    # 登记表中还没有该任务时（空记录），首条事件使用 Celery 结果后端的状态
+                    response = await resolve_task_status(task_id, record, request)
+                    yield f"data: {response.model_dump_json()}\n\n"
+                    if response.status.value in TERMINAL_STATES:
+                        return
+                record = await anext(watcher)
+        except redis.RedisError as e:
+            # 连接中断后客户端会回退为轮询
+            print(f"❌ 任务 {task_id} 的事件订阅中断: {e}")
+        finally:
+            await watcher.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止 nginx 缓冲事件流
+        }
+    )
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """
+    判断客户端的 Accept-Encoding 是否接受指定的内容编码
+    
+    Args:
+        accept_encoding: 请求头 Accept-Encoding 的值
+        encoding: 内容编码，如 gzip、zstd
+        
+    Returns:
+        bool: True表示客户端接受该编码
+    """
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() not in (encoding, '*'):
+            continue
+        # q=0 表示明确拒绝
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+@functools.lru_cache(maxsize=ETAG_CACHE_SIZE)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """计算文件内容的摘要；以 (路径, 大小, 修改时间) 为缓存键，文件被重写后自动重新计算"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_etag(path: str) -> str:
+    """
+    根据文件内容生成强 ETag（不含引号），同一文件只在首次请求或被重写后计算一次
+    
+    Args:
+        path: 文件路径
+        
+    Returns:
+        文件内容摘要
+    """
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_size, stat.st_mtime_ns)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 是否命中当前 ETag（按弱比较，忽略 W/ 前缀）
+    
+    Args:
+        if_none_match: 请求头 If-None-Match 的值
+        etag: 带引号的当前 ETag
+        
+    Returns:
+        bool: True表示客户端缓存仍然有效，应返回 304
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def negotiate_download_format(requested: Optional[DownloadFormat], accept: str) -> str:
+    """
+    确定下载格式：优先使用 ?format= 参数，其次根据 Accept 请求头，默认原样下载
+    
+    Args:
+        requested: ?format= 参数的值
+        accept: 请求头 Accept 的值
+        
+    Returns:
+        下载格式："json"（原样）、"compact"、"ndjson" 或 "csv"
+    """
+    if requested is not None:
+        return requested.value
+    for item in accept.split(','):
+        media_type = item.split(';')[0].strip().lower()
+        if media_type == 'text/csv':
+            return 'csv'
+        if media_type in ('application/x-ndjson', 'application/ndjson'):
+            return 'ndjson'
+        if media_type == 'application/json':
+            return 'json'
+    return 'json'
+
+
 @app.get("/api/download/{task_id}")
-async def download_file(task_id: str):
+async def download_file(
+    task_id: str,
+    request: Request,
+    download_format: Optional[DownloadFormat] = Query(None, alias="format", description="下载格式：json、compact、ndjson、csv")
+):
     """
     下载爬取结果文件
     
+    通过 ?format= 参数或 Accept 请求头（text/csv、application/x-ndjson）选择格式。
+    原样下载时，压缩的结果文件在客户端支持对应编码时原样发送并声明 Content-Encoding，
+    否则边解压边发送；未压缩的结果文件有预压缩副本（.precomp.br/.precomp.gz）且客户端支持时发送副本。
+    其他格式从结果文件边读边转换，不会生成完整的转换结果。
+    
+    所有响应都带有根据文件内容生成的强 ETag，If-None-Match 命中时返回 304；
+    直接发送文件时支持 Range 断点续传。
+    
     Args:
         task_id: 任务 ID
+        request: 请求对象，用于读取 Accept、Accept-Encoding 和 If-None-Match
+        download_format: 下载格式
         
     Returns:
         文件下载响应
@@ -404,17 +677,19 @@ async def download_file(task_id: str):
     try:
         print(f"=== 下载请求处理 ===")
         print(f"🔍 任务ID: {task_id}")
-        print(f"🔍 当前文件映射: {list(task_file_mapping.keys())}")
         
-        # 检查任务是否存在文件映射
-        if task_id not in task_file_mapping:
-            print(f"❌ 任务 {task_id} 不在文件映射中")
+        # 从产物索引查找结果文件
+        artifact = await artifact_index.aget(task_id)
+        if artifact is None:
+            artifact = await run_in_threadpool(artifact_from_task_result, task_id)
+        if artifact is None:
+            print(f"❌ 任务 {task_id} 没有结果文件记录")
             raise HTTPException(
                 status_code=404,
                 detail="任务文件不存在或任务尚未完成"
             )
         
-        file_path = task_file_mapping[task_id]
+        file_path = artifact["file_path"]
         print(f"🔍 文件路径: {file_path}")
         
         # 检查文件是否存在
@@ -425,9 +700,17 @@ async def download_file(task_id: str):
                 detail="文件不存在"
             )
         
-        # 获取文件名和大小
-        filename = os.path.basename(file_path)
+        # 获取文件名和大小，下载文件名不带压缩后缀
+        content_encoding = artifact_content_encoding(file_path)
+        filename = strip_compression_suffix(os.path.basename(file_path))
         file_size = os.path.getsize(file_path)
+        
+        # 确定下载格式，转换时下载文件名使用目标格式的后缀
+        target_format = negotiate_download_format(download_format, request.headers.get('accept', ''))
+        if target_format != 'json':
+            media_type, suffix = CONVERT_FORMATS[target_format]
+            filename = os.path.splitext(filename)[0] + suffix
+        print(f"🔍 下载格式: {target_format}")
         print(f"🔍 原始文件名: {repr(filename)}")  # 使用 repr 来显示特殊字符
         print(f"🔍 文件大小: {file_size} bytes")
         
@@ -461,17 +744,74 @@ async def download_file(task_id: str):
             content_disposition = 'attachment; filename="comments.json"'
             print(f"🔍 使用默认文件名: {filename}")
         
-        # 返回文件下载响应
+        accept_encoding = request.headers.get('accept-encoding', '')
+        if_none_match = request.headers.get('if-none-match')
+        # 计算摘要需要读取整个文件，在线程池中执行，不阻塞事件循环
+        digest = await run_in_threadpool(artifact_etag, file_path)
+        
+        # 转换为其他格式：边读边转换并流式发送
+        if target_format != 'json':
+            etag = f'"{digest}-{target_format}"'
+            cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+            if etag_matches(if_none_match, etag):
+                print(f"✅ 客户端缓存仍有效，返回 304")
+                return Response(status_code=304, headers=cache_headers)
+            return StreamingResponse(
+                iter_converted(file_path, target_format),
+                media_type=media_type,
+                headers={
+                    "Content-Disposition": content_disposition,
+                    "Access-Control-Expose-Headers": "Content-Disposition, ETag",
+                    **cache_headers
+                }
+            )
+        
+        # 客户端不支持结果文件的压缩编码时，解压后流式发送
+        if content_encoding and not accepts_encoding(accept_encoding, content_encoding):
+            print(f"🔍 客户端不接受 {content_encoding} 编码，解压后发送")
+            etag = f'"{digest}-identity"'
+            cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+            if etag_matches(if_none_match, etag):
+                print(f"✅ 客户端缓存仍有效，返回 304")
+                return Response(status_code=304, headers=cache_headers)
+            return StreamingResponse(
+                iter_artifact_chunks(file_path),
+                media_type='application/json',
+                headers={
+                    "Content-Disposition": content_disposition,
+                    "Access-Control-Expose-Headers": "Content-Disposition, ETag",
+                    **cache_headers
+                }
+            )
+        
+        # 未压缩的结果文件优先发送客户端支持的预压缩副本
+        served_path = file_path
+        if not content_encoding:
+            for encoding, sibling in precompressed_siblings(file_path).items():
+                if accepts_encoding(accept_encoding, encoding):
+                    served_path, content_encoding = sibling, encoding
+                    digest = await run_in_threadpool(artifact_etag, served_path)
+                    print(f"🔍 发送 {encoding} 预压缩副本: {served_path}")
+                    break
+        
+        etag = f'"{digest}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+        encoding_headers = {"Content-Encoding": content_encoding} if content_encoding else {}
+        if etag_matches(if_none_match, etag):
+            print(f"✅ 客户端缓存仍有效，返回 304")
+            return Response(status_code=304, headers=cache_headers)
+        
+        # 返回文件下载响应；Content-Length 与 Range 请求由 FileResponse 根据实际发送的文件处理
         try:
             response = FileResponse(
-                path=file_path,
+                path=served_path,
                 filename=ascii_filename,  # 使用ASCII安全的文件名传给FileResponse
                 media_type='application/json',
                 headers={
                     "Content-Disposition": content_disposition,
-                    "Content-Length": str(file_size),
-                    "Cache-Control": "no-cache",
-                    "Access-Control-Expose-Headers": "Content-Disposition"  # 确保CORS暴露这个头
+                    "Access-Control-Expose-Headers": "Content-Disposition, ETag, Content-Range",  # 确保CORS暴露这些头
+                    **cache_headers,
+                    **encoding_headers
                 }
             )
             
@@ -482,12 +822,14 @@ async def download_file(task_id: str):
             print(f"❌ 创建FileResponse失败: {response_error}")
             # 尝试使用最简单的响应方式
             return FileResponse(
-                path=file_path,
+                path=served_path,
                 filename="comments.json",
                 media_type='application/json',
                 headers={
                     "Content-Disposition": 'attachment; filename="comments.json"',
-                    "Access-Control-Expose-Headers": "Content-Disposition"
+                    "Access-Control-Expose-Headers": "Content-Disposition",
+                    **cache_headers,
+                    **encoding_headers
                 }
             )
         
@@ -502,18 +844,180 @@ async def download_file(task_id: str):
         )
 
 
+def artifact_from_task_result(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    产物索引中没有记录时（如索引上线前完成的任务），从 Celery 任务结果中读取结果文件，
+    并补写到产物索引
+    
+    Args:
+        task_id: 任务 ID
+        
+    Returns:
+        包含 file_path 的爬取结果，任务未成功完成时返回 None
+    """
+    try:
+        task_result = celery_app.AsyncResult(task_id)
+        result = task_result.result if task_result.state == 'SUCCESS' else None
+    except Exception as e:
+        print(f"❌ 获取任务结果失败: {str(e)}")
+        return None
+    if not isinstance(result, dict):
+        return None
+    result = result.get('result', result)
+    if not isinstance(result, dict) or not result.get('file_path'):
+        return None
+    artifact_index.record(task_id, result)
+    return result
+
+
+def resolve_result_file(task_id: str) -> Optional[str]:
+    """
+    查找任务的结果文件路径，优先使用产物索引，找不到时从 Celery 任务结果中读取
+    
+    Args:
+        task_id: 任务 ID
+        
+    Returns:
+        结果文件路径，任务未完成或文件不存在时返回 None
+    """
+    artifact = artifact_index.get(task_id) or artifact_from_task_result(task_id)
+    if artifact is None:
+        return None
+    file_path = artifact['file_path']
+    return file_path if os.path.exists(file_path) else None
+
+
+def open_task_result_index(task_id: str) -> ResultIndex:
+    """
+    打开任务结果文件的索引
+    
+    索引只为未压缩的结果文件生成（压缩文件中的字节偏移无法随机访问），
+    以 gzip/zstd 压缩输出的结果返回 409，需通过下载接口获取完整文件。
+    
+    Args:
+        task_id: 任务 ID
+        
+    Returns:
+        结果文件的读取器
+        
+    Raises:
+        HTTPException: 任务未完成或文件不存在时为 404；结果文件已压缩时为 409；
+            未压缩但没有可用索引（旧版本的结果）时为 404
+    """
+    file_path = resolve_result_file(task_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="任务文件不存在或任务尚未完成")
+    
+    content_encoding = artifact_content_encoding(file_path)
+    if content_encoding is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"该结果以 {content_encoding} 压缩保存，不支持分页查询；"
+                   f"请通过下载接口获取完整文件，或以 output_compression=none 重新爬取"
+        )
+    
+    index = get_result_index(file_path)
+    if index is None:
+        raise HTTPException(
+            status_code=404,
+            detail="该结果没有可用的索引（旧版本的结果），请通过下载接口获取完整文件"
+        )
+    return index
+
+
+@app.get("/api/results/{task_id}/comments", response_model=CommentPageResponse)
+def list_root_comments(
+    task_id: str,
+    offset: int = Query(0, ge=0, description="跳过的根评论数"),
+    limit: int = Query(20, ge=1, le=200, description="返回的根评论数"),
+    sort: CommentSort = Query(CommentSort.TIME, description="排序字段"),
+    order: SortOrder = Query(SortOrder.DESC, description="排序方向")
+):
+    """
+    分页列出已完成任务的根评论（不含回复），通过结果索引只解码当前页的根评论，不解码其下的回复
+    
+    只支持未压缩的结果文件；以 gzip/zstd 压缩输出的任务返回 409。
+    
+    Args:
+        task_id: 任务 ID
+        offset: 跳过的根评论数
+        limit: 返回的根评论数
+        sort: 排序字段
+        order: 排序方向
+        
+    Returns:
+        根评论分页数据
+    """
+    index = open_task_result_index(task_id)
+    positions = index.sorted_positions(sort.value, descending=order == SortOrder.DESC)
+    
+    items = []
+    for position in positions[offset:offset + limit]:
+        # 只解码根评论自身的字段，回复数取自索引
+        root = index.read_root(position)
+        root['回复数'] = index.entry(position)['replies']
+        items.append(root)
+    
+    return CommentPageResponse(
+        task_id=task_id,
+        total_roots=len(index),
+        total_comments=index.total_comments,
+        offset=offset,
+        limit=limit,
+        sort=sort,
+        order=order,
+        items=items
+    )
+
+
+@app.get("/api/results/{task_id}/comments/{root_id}/replies", response_model=ReplyPageResponse)
+def list_comment_replies(
+    task_id: str,
+    root_id: int,
+    offset: int = Query(0, ge=0, description="跳过的回复数"),
+    limit: int = Query(50, ge=1, le=500, description="返回的回复数")
+):
+    """
+    按需获取某个根评论下的回复，只解码该根评论所在的回复串
+    
+    只支持未压缩的结果文件；以 gzip/zstd 压缩输出的任务返回 409。
+    
+    Args:
+        task_id: 任务 ID
+        root_id: 根评论 ID
+        offset: 跳过的直接回复数
+        limit: 返回的直接回复数
+        
+    Returns:
+        回复分页数据
+    """
+    index = open_task_result_index(task_id)
+    position = index.find(root_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"根评论 {root_id} 不存在")
+    
+    replies = index.read_tree(position)['replies']
+    return ReplyPageResponse(
+        task_id=task_id,
+        root_id=root_id,
+        total_replies=len(replies),
+        offset=offset,
+        limit=limit,
+        replies=replies[offset:offset + limit]
+    )
+
+
 @app.get("/api/tasks")
 async def list_active_tasks():
     """
-    列出活跃的任务（可选的管理接口）
+    列出活跃的任务（可选的管理接口），数据来自 Worker 状态快照
     
     Returns:
         活跃任务列表
     """
     try:
         # 获取活跃任务
-        inspect = celery_app.control.inspect()
-        active_tasks = inspect.active()
+        active_tasks = cluster_state.snapshot.active
         
         if active_tasks:
             # 格式化任务信息
@@ -568,19 +1072,24 @@ async def cancel_task(task_id: str):
 @app.get("/api/health")
 async def health_check():
     """
-    健康检查接口
+    健康检查接口，Celery 状态来自后台定期刷新的 Worker 状态快照
     
     Returns:
         服务健康状态
     """
     try:
         # 检查 Celery 连接
-        inspect = celery_app.control.inspect()
-        stats = inspect.stats()
-        active_workers = inspect.active()
-        registered_tasks = inspect.registered()
+        # 同一次检查的各项数据都来自同一个快照
+        snapshot = cluster_state.snapshot
+        stats = snapshot.stats
+        active_workers = snapshot.active
+        registered_tasks = snapshot.registered
+        snapshot_age = snapshot.age
         
-        celery_status = "healthy" if stats else "unhealthy"
+        if snapshot_age is None:
+            celery_status = "unknown" if snapshot.error is None else "unhealthy"
+        else:
+            celery_status = "healthy" if stats else "unhealthy"
         
         # === 添加详细的健康检查信息 ===
         health_info = {
@@ -593,7 +1102,9 @@ async def health_check():
                 "workers": list(stats.keys()) if stats else [],
                 "active_tasks_count": sum(len(tasks) for tasks in active_workers.values()) if active_workers else 0,
                 "registered_tasks": registered_tasks,
-                "broker_connection": "connected" if stats else "disconnected"
+                "broker_connection": "connected" if stats else "disconnected",
+                "snapshot_age_seconds": round(snapshot_age, 1) if snapshot_age is not None else None,
+                "snapshot_error": snapshot.error
             }
         }
         
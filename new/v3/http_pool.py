@@ -0,0 +1,97 @@
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+from bilibili_api import get_client, select_client, set_session
+
+# 连接池参数，可通过环境变量覆盖
+HTTP_POOL_LIMIT = int(os.getenv("CRAWLER_HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("CRAWLER_HTTP_POOL_LIMIT_PER_HOST", "16"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("CRAWLER_HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("CRAWLER_HTTP_DNS_CACHE_TTL", "300"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("CRAWLER_HTTP_REQUEST_TIMEOUT", "30"))
+
+# 每个工作进程独享的事件循环和会话；记录创建时的 pid，防止 fork 后误用父进程的对象
+_pool_pid: Optional[int] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def _open_session() -> aiohttp.ClientSession:
+    """在当前事件循环中创建带连接复用和DNS缓存的会话，并交给 bilibili_api 使用"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT),
+        trust_env=True,
+    )
+    select_client("aiohttp")
+    # bilibili_api 按事件循环保存会话，只能替换已存在的会话：
+    # 先让它为当前循环创建默认客户端并关闭，再换成共享会话
+    await get_client().close()
+    set_session(session)
+    return session
+
+
+def init_http_pool() -> asyncio.AbstractEventLoop:
+    """
+    初始化当前工作进程的事件循环和共享连接池，重复调用时直接返回已有的事件循环
+
+    Returns:
+        当前进程的工作事件循环
+    """
+    global _pool_pid, _worker_loop, _session
+
+    if _pool_pid == os.getpid() and _worker_loop and not _worker_loop.is_closed():
+        return _worker_loop
+
+    _pool_pid = os.getpid()
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _session = _worker_loop.run_until_complete(_open_session())
+
+    print(
+        f"🔌 [连接池] 进程 {_pool_pid} 已初始化共享连接池: "
+        f"总连接上限={HTTP_POOL_LIMIT}, 单主机上限={HTTP_POOL_LIMIT_PER_HOST}, "
+        f"DNS缓存={HTTP_DNS_CACHE_TTL}s"
+    )
+    return _worker_loop
+
+
+def run_in_worker_loop(coro):
+    """
+    在当前进程的工作事件循环中运行协程，所有任务共享同一个连接池
+
+    Args:
+        coro: 要运行的协程
+
+    Returns:
+        协程的返回值
+    """
+    return init_http_pool().run_until_complete(coro)
+
+
+def close_http_pool():
+    """关闭当前进程的共享连接池和工作事件循环"""
+    global _pool_pid, _worker_loop, _session
+
+    if _pool_pid != os.getpid() or _worker_loop is None:
+        return
+
+    try:
+        if _session is not None and not _session.closed:
+            _worker_loop.run_until_complete(_session.close())
+        _worker_loop.close()
+        asyncio.set_event_loop(None)
+        print(f"🔌 [连接池] 进程 {_pool_pid} 的共享连接池已关闭")
+    finally:
+        _pool_pid = None
+        _worker_loop = None
+        _session = None
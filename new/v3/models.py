@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 from enum import Enum
 
 
@@ -12,6 +12,54 @@ class TaskStatus(str, Enum):
     FAILURE = "FAILURE"      # 失败
     RETRY = "RETRY"          # 重试中
     REVOKED = "REVOKED"      # 已撤销
+    ERROR = "ERROR"          # 状态查询异常（非 Celery 状态）
+
+
+class PaginationMode(str, Enum):
+    """主评论分页模式枚举"""
+    PAGE = "page"        # 按页码分页（page_index）
+    CURSOR = "cursor"    # 按游标分页（懒加载接口，不受新增评论导致的页面漂移影响）
+
+
+class OutputFormat(str, Enum):
+    """结果文件格式枚举"""
+    JSON = "json"          # 带缩进的JSON（默认，便于阅读）
+    COMPACT = "compact"    # 无缩进的紧凑JSON，体积更小、写入更快
+
+
+class OutputCompression(str, Enum):
+    """结果文件压缩方式枚举"""
+    NONE = "none"    # 不压缩
+    GZIP = "gzip"    # gzip 压缩（.json.gz）
+    ZSTD = "zstd"    # zstd 压缩（.json.zst），未安装 zstandard 时回退为 gzip
+
+
+class ExportFormat(str, Enum):
+    """额外导出格式枚举（每条评论一行）"""
+    NDJSON = "ndjson"      # 每行一个JSON对象，便于流式消费
+    PARQUET = "parquet"    # 列式存储，便于分析（需要安装 pyarrow）
+    SQLITE = "sqlite"      # SQLite 数据库，带父评论/用户/时间索引
+
+
+class DownloadFormat(str, Enum):
+    """下载格式枚举"""
+    JSON = "json"          # 原样下载结果文件
+    COMPACT = "compact"    # 无缩进的紧凑JSON
+    NDJSON = "ndjson"      # 每行一条评论的扁平NDJSON
+    CSV = "csv"            # 每行一条评论的CSV（带BOM，可直接用Excel打开）
+
+
+class CommentSort(str, Enum):
+    """根评论排序字段枚举"""
+    TIME = "time"          # 按发布时间
+    LIKES = "likes"        # 按点赞数
+    REPLIES = "replies"    # 按回复数
+
+
+class SortOrder(str, Enum):
+    """排序方向枚举"""
+    DESC = "desc"    # 倒序
+    ASC = "asc"      # 正序
 
 
 class BilibiliCookie(BaseModel):
@@ -52,6 +100,12 @@ class CrawlRequest(BaseModel):
     """爬取请求模型"""
     bv_id: str = Field(..., description="B站视频BV号", min_length=12, max_length=12)
     cookie: BilibiliCookie = Field(..., description="B站Cookie信息")  # 添加这行
+    pagination_mode: PaginationMode = Field(PaginationMode.PAGE, description="主评论分页模式：page 按页码，cursor 按游标")
+    incremental: bool = Field(False, description="增量爬取：只获取上次爬取之后的新评论并合并到上次的结果")
+    reuse_unchanged_threads: bool = Field(False, description="复用上次抓取的回复串：回复数与最后回复未变化的根评论不再请求子评论")
+    output_format: OutputFormat = Field(OutputFormat.JSON, description="结果文件格式：json 带缩进，compact 无缩进")
+    output_compression: OutputCompression = Field(OutputCompression.NONE, description="结果文件压缩方式：none、gzip 或 zstd；压缩后的结果不支持 /api/results 分页查询")
+    export_formats: List[ExportFormat] = Field(default_factory=list, description="额外导出的扁平格式：ndjson、parquet、sqlite，与JSON在同一遍写入")
     
     @field_validator('bv_id')
     @classmethod
@@ -73,7 +127,13 @@ class CrawlRequest(BaseModel):
                     "buvid3": "your_buvid3_here",
                     "dedeuserid": "your_dedeuserid_here",
                     "ac_time_value": "your_ac_time_value_here"
-                }
+                },
+                "pagination_mode": "page",
+                "incremental": False,
+                "reuse_unchanged_threads": False,
+                "output_format": "json",
+                "output_compression": "none",
+                "export_formats": ["ndjson"]
             }
         }
 
@@ -106,6 +166,16 @@ class TaskResult(BaseModel):
     most_active_count: Optional[int] = None
     max_likes: Optional[int] = None
     max_likes_comment: Optional[str] = None
+    incremental: Optional[bool] = Field(None, description="本次是否为增量爬取")
+    new_comments: Optional[int] = Field(None, description="本次新获取的评论数")
+    reused_threads: Optional[int] = Field(None, description="复用缓存、未重新请求的回复串数量")
+    avoided_sub_requests: Optional[int] = Field(None, description="直接使用预览回复而省去的子评论请求数")
+    rate_limit: Optional[Dict[str, Any]] = Field(None, description="限速器统计：请求数、被限流次数、等待时长、最终速率")
+    output_format: Optional[str] = Field(None, description="结果文件格式")
+    content_encoding: Optional[str] = Field(None, description="结果文件的压缩编码（gzip/zstd），未压缩时为空")
+    export_files: Optional[Dict[str, str]] = Field(None, description="额外导出文件：导出格式 -> 文件路径")
+    index_file: Optional[str] = Field(None, description="结果文件的根评论字节偏移索引，压缩输出时为空")
+    precompressed_files: Optional[Dict[str, str]] = Field(None, description="预压缩副本：内容编码 -> 文件路径")
 
 
 class TaskStatusResponse(BaseModel):
@@ -114,6 +184,7 @@ class TaskStatusResponse(BaseModel):
     status: TaskStatus
     result: Optional[TaskResult] = None
     progress: Optional[str] = None
+    progress_detail: Optional[Dict[str, Any]] = Field(None, description="结构化的爬取进度（页数、根评论数、回复数、请求数、限速等待时间、预计总数等），仅进行中的任务提供")
     error: Optional[str] = None
     download_url: Optional[str] = None
     
@@ -134,3 +205,69 @@ class TaskStatusResponse(BaseModel):
                 "download_url": "/api/download/550e8400-e29b-41d4-a716-446655440000"
             }
         }
+
+
+class BatchStatusRequest(BaseModel):
+    """批量状态查询请求模型"""
+    task_ids: List[str] = Field(..., description="任务 ID 列表", min_length=1, max_length=200)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "task_ids": [
+                    "550e8400-e29b-41d4-a716-446655440000",
+                    "6fa459ea-ee8a-3ca4-894e-db77e160355e"
+                ]
+            }
+        }
+
+
+class BatchStatusResponse(BaseModel):
+    """批量状态查询响应模型"""
+    tasks: List[TaskStatusResponse] = Field(..., description="与请求顺序一致的任务状态列表")
+
+
+class CommentPageResponse(BaseModel):
+    """根评论分页响应模型"""
+    task_id: str
+    total_roots: int = Field(..., description="根评论总数")
+    total_comments: int = Field(..., description="评论总数（含所有回复）")
+    offset: int
+    limit: int
+    sort: CommentSort
+    order: SortOrder
+    items: List[Dict[str, Any]] = Field(..., description="根评论列表，不含回复，附带回复数")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "task_id": "550e8400-e29b-41d4-a716-446655440000",
+                "total_roots": 1200,
+                "total_comments": 5600,
+                "offset": 0,
+                "limit": 1,
+                "sort": "likes",
+                "order": "desc",
+                "items": [
+                    {
+                        "评论ID": 123456789,
+                        "用户名": "用户名",
+                        "评论内容": "评论内容",
+                        "点赞数": 1024,
+                        "回复时间": "2024-01-01 12:00:00",
+                        "父评论ID": 0,
+                        "回复数": 35
+                    }
+                ]
+            }
+        }
+
+
+class ReplyPageResponse(BaseModel):
+    """根评论回复分页响应模型"""
+    task_id: str
+    root_id: int = Field(..., description="根评论ID")
+    total_replies: int = Field(..., description="根评论下的直接回复数")
+    offset: int
+    limit: int
+    replies: List[Dict[str, Any]] = Field(..., description="直接回复列表，每条回复带有其下的楼中楼回复")
@@ -0,0 +1,378 @@
+import gzip
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Sequence
+
+from export_sinks import open_export_sinks
+from result_index import ResultIndexBuilder
+
+# 可选依赖：安装 orjson 时使用其编码/解析，安装 zstandard 时支持 zstd 压缩，
+# 安装 brotli 时支持生成 br 预压缩副本
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 输出格式："json" 为带缩进的可读格式，"compact" 为无缩进、无多余空白的紧凑格式
+OUTPUT_FORMATS = ("json", "compact")
+# 压缩方式及对应的文件后缀
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+# 文件后缀对应的 HTTP Content-Encoding
+CONTENT_ENCODINGS = {".gz": "gzip", ".zst": "zstd"}
+
+GZIP_LEVEL = int(os.getenv("CRAWLER_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("CRAWLER_ZSTD_LEVEL", "3"))
+# 读取/下载压缩文件时每次解压的字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 预压缩副本的内容编码及后缀，按下载时的优先顺序排列；副本与未压缩的结果文件放在一起，
+# 下载时直接发送给支持对应编码的客户端，无需在请求时压缩。
+# 后缀带 ".precomp"，避免与 gzip 压缩输出的结果文件（xxx.json.gz）重名
+PRECOMPRESS_SUFFIXES = {"br": ".precomp.br", "gzip": ".precomp.gz"}
+# 结果文件写入后要生成的预压缩副本，逗号分隔，如 "br,gzip"；为空时不生成
+PRECOMPRESS_ENCODINGS = tuple(
+    encoding.strip()
+    for encoding in os.getenv("CRAWLER_PRECOMPRESS", "").split(",")
+    if encoding.strip()
+)
+BROTLI_QUALITY = int(os.getenv("CRAWLER_BROTLI_QUALITY", "9"))
+
+
+def resolve_compression(compression: str) -> str:
+    """
+    校验压缩方式；未安装 zstandard 时 zstd 回退为 gzip
+
+    Args:
+        compression: 请求的压缩方式，"none"、"gzip" 或 "zstd"
+
+    Returns:
+        实际使用的压缩方式
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    if compression == "zstd" and zstandard is None:
+        print("⚠️ 未安装 zstandard，输出改用 gzip 压缩。")
+        return "gzip"
+    return compression
+
+
+def artifact_content_encoding(path: str) -> Optional[str]:
+    """根据文件后缀返回结果文件对应的 Content-Encoding，未压缩时返回 None"""
+    return CONTENT_ENCODINGS.get(os.path.splitext(path)[1])
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """去掉文件名中的压缩后缀，得到解压后的文件名"""
+    root, ext = os.path.splitext(filename)
+    return root if ext in CONTENT_ENCODINGS else filename
+
+
+def encode_tree(tree: Dict[str, Any], output_format: str) -> bytes:
+    """把一棵根评论树编码为UTF-8字节串；orjson 的输出与标准库逐字节一致，不可用时回退到标准库"""
+    if orjson is not None:
+        try:
+            if output_format == "compact":
+                return orjson.dumps(tree)
+            return orjson.dumps(tree, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass
+    if output_format == "compact":
+        text = json.dumps(tree, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(tree, ensure_ascii=False, indent=2)
+    return text.encode("utf-8")
+
+
+class JsonArrayWriter:
+    """
+    流式JSON数组写入器：逐个写入根评论树，写完即可释放，不需要先在内存中构建完整列表。
+    "json" 格式的输出与 json.dump(list, ensure_ascii=False, indent=2) 逐字节一致，
+    "compact" 格式与 separators=(",", ":") 的输出一致。可选在写入时进行 gzip/zstd 压缩。
+
+    先写入临时文件，关闭时再原子替换为目标文件；出错时删除临时文件，不影响已有的同名文件。
+    """
+
+    def __init__(
+        self, path: str, output_format: str = "json", compression: str = "none"
+    ):
+        """
+        初始化写入器
+
+        Args:
+            path: 目标文件路径（应已包含压缩后缀）
+            output_format: 输出格式，"json" 或 "compact"
+            compression: 压缩方式，"none"、"gzip" 或 "zstd"
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.output_format = output_format
+        self._tmp_path = f"{path}.part"
+        self._raw = open(self._tmp_path, "wb")
+        self._file: BinaryIO = self._raw
+        if compression == "gzip":
+            # 不记录文件名和时间，相同内容得到相同的压缩结果
+            self._file = gzip.GzipFile(
+                filename="",
+                mode="wb",
+                fileobj=self._raw,
+                compresslevel=GZIP_LEVEL,
+                mtime=0,
+            )
+        elif compression == "zstd":
+            self._file = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+                self._raw, closefd=False
+            )
+        self.roots = 0
+        self.total_comments = 0
+        # 未压缩时记录已写入的字节数和每个根评论树的位置，用于生成索引文件；
+        # 压缩文件中的偏移没有意义，不生成索引
+        self._position = 0
+        self.index = ResultIndexBuilder() if compression == "none" else None
+
+    def write(self, tree: Dict[str, Any]):
+        """
+        写入一棵简化格式的根评论树
+
+        Args:
+            tree: 简化格式的根评论树
+        """
+        data = encode_tree(tree, self.output_format)
+        if self.output_format == "compact":
+            prefix = b"[" if self.roots == 0 else b","
+        else:
+            # 数组元素在 indent=2 时整体缩进一级；JSON字符串中的换行已被转义，可以直接替换
+            prefix = b"[\n  " if self.roots == 0 else b",\n  "
+            data = data.replace(b"\n", b"\n  ")
+        self._file.write(prefix + data)
+
+        comments = count_tree_comments(tree)
+        if self.index is not None:
+            # "replies" 是树的最后一个键；JSON字符串中的引号都已转义，
+            # 第一个 "replies": 即根评论的回复列表，之前去掉逗号就是根评论自身的字段
+            root_length = len(data[: data.find(b'"replies":')].rstrip()) - 1
+            self.index.add(
+                tree["评论ID"],
+                self._position + len(prefix),
+                len(data),
+                root_length,
+                tree["点赞数"],
+                tree["回复时间"],
+                comments - 1,
+            )
+            self._position += len(prefix) + len(data)
+        self.roots += 1
+        self.total_comments += comments
+
+    def _close_files(self):
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+
+    def close(self):
+        """写入数组结尾并替换为目标文件"""
+        if not self.roots:
+            self._file.write(b"[]")
+        else:
+            self._file.write(b"]" if self.output_format == "compact" else b"\n]")
+        self._close_files()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        self._close_files()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def count_tree_comments(tree: Dict[str, Any]) -> int:
+    """统计一棵简化格式评论树中的评论总数（含所有层级的回复）"""
+    total = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(node["replies"])
+    return total
+
+
+def write_comment_trees(
+    path: str,
+    trees: Iterable[Dict[str, Any]],
+    output_format: str = "json",
+    compression: str = "none",
+    export_formats: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """
+    逐棵写入根评论树到JSON文件，并在同一遍历中写入额外的扁平导出文件
+
+    Args:
+        path: 目标文件路径（应已包含压缩后缀）
+        trees: 按输出顺序产出简化格式根评论树的可迭代对象，可以是惰性生成器
+        output_format: 输出格式，"json" 或 "compact"
+        compression: 压缩方式，"none"、"gzip" 或 "zstd"
+        export_formats: 额外的导出格式，可包含 "ndjson"、"parquet"、"sqlite"，
+            导出文件与JSON文件同名、后缀不同
+
+    Returns:
+        包含根评论数 roots、评论总数 total_comments、
+        导出文件路径 export_files（导出格式 -> 路径）以及索引文件路径 index_file 的字典。
+        只有未压缩的结果文件才会生成索引，压缩时 index_file 为 None
+    """
+    base_path = strip_compression_suffix(path)
+    if base_path.endswith(".json"):
+        base_path = base_path[: -len(".json")]
+
+    sinks = open_export_sinks(base_path, export_formats)
+    try:
+        with JsonArrayWriter(path, output_format, compression) as writer:
+            for tree in trees:
+                writer.write(tree)
+                for sink in sinks:
+                    sink.write(tree)
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
+    for sink in sinks:
+        sink.close()
+
+    index_file = None
+    if writer.index is not None:
+        index_file = writer.index.write(path, writer.total_comments, output_format)
+    return {
+        "roots": writer.roots,
+        "total_comments": writer.total_comments,
+        "export_files": {sink.export_format: sink.path for sink in sinks},
+        "index_file": index_file,
+    }
+
+
+def open_artifact(path: str) -> BinaryIO:
+    """
+    以二进制方式打开结果文件，按后缀透明解压
+
+    Args:
+        path: 结果文件路径
+
+    Returns:
+        读取解压后内容的文件对象
+    """
+    encoding = artifact_content_encoding(path)
+    if encoding == "gzip":
+        return gzip.open(path, "rb")
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 压缩的结果文件需要安装 zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    return open(path, "rb")
+
+
+def iter_artifact_chunks(
+    path: str, chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    逐块读取结果文件解压后的内容，用于向不支持对应压缩编码的客户端流式返回
+
+    Args:
+        path: 结果文件路径
+        chunk_size: 每块的字节数
+
+    Yields:
+        解压后的数据块
+    """
+    with open_artifact(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def precompress_artifact(path: str, encodings: Sequence[str]) -> Dict[str, str]:
+    """
+    为未压缩的结果文件生成预压缩副本（如 xxx.json.precomp.br、xxx.json.precomp.gz）；未安装 brotli 时跳过 br
+
+    Args:
+        path: 未压缩的结果文件路径
+        encodings: 要生成的内容编码，可包含 "br"、"gzip"
+
+    Returns:
+        内容编码 -> 副本路径
+    """
+    if artifact_content_encoding(path):
+        return {}
+    siblings = {}
+    for encoding in dict.fromkeys(encodings):
+        if encoding not in PRECOMPRESS_SUFFIXES:
+            raise ValueError(f"不支持的预压缩编码: {encoding}")
+        if encoding == "br" and brotli is None:
+            print("⚠️ 未安装 brotli，跳过 br 预压缩。")
+            continue
+
+        sibling = path + PRECOMPRESS_SUFFIXES[encoding]
+        tmp_path = f"{sibling}.part"
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            if encoding == "gzip":
+                with gzip.GzipFile(
+                    fileobj=dst, mode="wb", compresslevel=GZIP_LEVEL, mtime=0
+                ) as gz:
+                    for chunk in iter(lambda: src.read(READ_CHUNK_SIZE), b""):
+                        gz.write(chunk)
+            else:
+                compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+                for chunk in iter(lambda: src.read(READ_CHUNK_SIZE), b""):
+                    dst.write(compressor.process(chunk))
+                dst.write(compressor.finish())
+        os.replace(tmp_path, sibling)
+        siblings[encoding] = sibling
+    return siblings
+
+
+def precompressed_siblings(path: str) -> Dict[str, str]:
+    """
+    查找结果文件现有的预压缩副本，忽略早于结果文件的过期副本（结果文件已被重写）
+
+    Args:
+        path: 未压缩的结果文件路径
+
+    Returns:
+        内容编码 -> 副本路径，按 PRECOMPRESS_SUFFIXES 的优先顺序排列
+    """
+    try:
+        artifact_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    siblings = {}
+    for encoding, suffix in PRECOMPRESS_SUFFIXES.items():
+        try:
+            sibling_mtime = os.stat(path + suffix).st_mtime_ns
+        except OSError:
+            continue
+        if sibling_mtime >= artifact_mtime:
+            siblings[encoding] = path + suffix
+    return siblings
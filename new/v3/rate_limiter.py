@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+from bilibili_api.exceptions import NetworkException, ResponseCodeException
+
+# B站风控/限流相关的返回码
+RISK_CONTROL_CODES = {-412, -352, -509, -799}
+# 视为限流的 HTTP 状态码
+THROTTLE_HTTP_STATUSES = {412, 429}
+
+# 限速器默认参数（单位：请求/秒），可通过环境变量覆盖
+DEFAULT_RATE = float(os.getenv("CRAWLER_RATE_LIMIT", "5.0"))
+DEFAULT_MIN_RATE = float(os.getenv("CRAWLER_RATE_LIMIT_MIN", "0.3"))
+DEFAULT_MAX_RATE = float(os.getenv("CRAWLER_RATE_LIMIT_MAX", "20.0"))
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """
+    判断异常是否属于风控/限流/超时，这类错误应当触发退避
+
+    Args:
+        exc: 请求时抛出的异常
+
+    Returns:
+        bool: True表示应当退避
+    """
+    if isinstance(exc, ResponseCodeException):
+        return exc.code in RISK_CONTROL_CODES
+    if isinstance(exc, NetworkException):
+        return exc.status in THROTTLE_HTTP_STATUSES
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError))
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶限速器，速率按 AIMD 规则自适应调整：
+    每次请求成功时速率加性增长，遇到风控码或超时时速率乘性下降并暂停一段时间。
+    同一次爬取中的所有请求共享同一个实例。
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        min_rate: float = DEFAULT_MIN_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+        burst: int = 3,
+        increase_step: float = 0.2,
+        decrease_factor: float = 0.5,
+        penalty_seconds: float = 5.0,
+    ):
+        """
+        初始化限速器
+
+        Args:
+            rate: 初始速率（请求/秒）
+            min_rate: 速率下限
+            max_rate: 速率上限
+            burst: 令牌桶容量，即允许的最大突发请求数
+            increase_step: 每次成功请求后速率的加性增量
+            decrease_factor: 触发风控时速率的乘性衰减系数
+            penalty_seconds: 触发风控后暂停发放令牌的时长
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.capacity = max(1, burst)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.penalty_seconds = penalty_seconds
+
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+        # 统计信息
+        self.wait_seconds = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self):
+        """等待直到获得一个令牌。等待者按到达顺序依次获得令牌。"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.requests += 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+
+                # 持锁等待，累计值即为整个爬取被限速阻塞的墙钟时间
+                self.wait_seconds += delay
+                await asyncio.sleep(delay)
+
+    def record_success(self):
+        """请求成功：加性提升速率"""
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_throttle(self):
+        """触发风控或超时：乘性降低速率，清空令牌并暂停发放"""
+        self.throttled += 1
+        now = time.monotonic()
+        # 并发中的请求可能同时失败，同一暂停窗口内只降速一次
+        if now < self._blocked_until:
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._tokens = 0.0
+        self._blocked_until = now + self.penalty_seconds
+        print(
+            f"⚠️ [限速器] 触发风控，速率降至 {self.rate:.2f} 次/秒，暂停 {self.penalty_seconds:.1f} 秒"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """返回限速统计信息"""
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "current_rate": round(self.rate, 3),
+        }
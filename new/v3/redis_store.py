@@ -0,0 +1,59 @@
+import os
+from typing import Optional
+
+import redis
+import redis.asyncio
+
+# 任务相关记录默认保存在 Celery 结果后端所在的 Redis
+DEFAULT_REDIS_URL = os.getenv("REDIS_RESULT_URL", "redis://redis:6379/1")
+# 访问 Redis 的超时时间（秒），Redis 不可用时尽快放弃，由调用方回退
+REDIS_STORE_TIMEOUT = float(os.getenv("REDIS_STORE_TIMEOUT", "2"))
+
+
+class RedisStore:
+    """
+    基于 Redis 的存储基类：按需创建同步客户端（Celery 任务、信号处理、同步接口使用）
+    和异步客户端（async 接口使用），两者共用同一个连接地址
+    """
+
+    def __init__(self, redis_url: str = DEFAULT_REDIS_URL):
+        """
+        初始化存储，连接在首次使用时建立
+
+        Args:
+            redis_url: Redis 连接地址
+        """
+        self.redis_url = redis_url
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[redis.asyncio.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_timeout=REDIS_STORE_TIMEOUT,
+                socket_connect_timeout=REDIS_STORE_TIMEOUT,
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> redis.asyncio.Redis:
+        if self._async_client is None:
+            self._async_client = redis.asyncio.Redis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_timeout=REDIS_STORE_TIMEOUT,
+                socket_connect_timeout=REDIS_STORE_TIMEOUT,
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -0,0 +1,155 @@
+import codecs
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator
+
+from export_sinks import ROW_FIELDS, iter_flat_rows
+from output_writers import READ_CHUNK_SIZE, encode_tree, open_artifact
+from result_index import get_result_index
+
+# 可转换的下载格式 -> (Content-Type, 文件后缀)
+CONVERT_FORMATS = {
+    "compact": ("application/json", ".json"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+}
+# 累计到该字节数再交给响应发送，避免逐行发送的开销
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def _iter_array_items(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    增量解析结果文件中的JSON数组，逐个产出元素，内存中只保留当前元素及未解析的缓冲区
+
+    Args:
+        path: 结果文件路径，可以是压缩文件
+
+    Yields:
+        数组中的根评论树
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    whitespace = " \t\r\n"
+    buf = ""
+    pos = 0
+    started = False
+    eof = False
+    read_size = READ_CHUNK_SIZE
+
+    with open_artifact(path) as f:
+        while True:
+            # 跳过空白和分隔符，定位到下一个元素的开头
+            while pos < len(buf) and (
+                buf[pos] in whitespace or (started and buf[pos] == ",")
+            ):
+                pos += 1
+            if pos < len(buf):
+                if not started:
+                    if buf[pos] != "[":
+                        raise ValueError("结果文件不是JSON数组")
+                    started = True
+                    pos += 1
+                    continue
+                if buf[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    # 元素尚未读完整：加大读取量后重试，避免对大元素反复从头解析
+                    read_size *= 2
+                else:
+                    yield item
+                    pos = end
+                    read_size = READ_CHUNK_SIZE
+                    continue
+            elif eof:
+                raise ValueError("结果文件不完整")
+
+            chunk = f.read(read_size)
+            eof = not chunk
+            buf = buf[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+
+def iter_result_trees(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    按文件中的顺序逐个读取结果文件中的根评论树
+
+    有索引时通过 mmap 逐个解码，否则增量解析（支持压缩文件），都不会把整个文件读入内存。
+
+    Args:
+        path: 结果文件路径
+
+    Yields:
+        简化格式的根评论树
+    """
+    index = get_result_index(path)
+    if index is None:
+        yield from _iter_array_items(path)
+        return
+    for position in range(len(index)):
+        yield index.read_tree(position)
+
+
+def _iter_compact(path: str) -> Iterator[bytes]:
+    yield b"["
+    for i, tree in enumerate(iter_result_trees(path)):
+        yield (b"," if i else b"") + encode_tree(tree, "compact")
+    yield b"]"
+
+
+def _iter_ndjson(path: str) -> Iterator[bytes]:
+    for tree in iter_result_trees(path):
+        yield "".join(
+            json.dumps(row, ensure_ascii=False) + "\n" for row in iter_flat_rows(tree)
+        ).encode("utf-8")
+
+
+def _iter_csv(path: str) -> Iterator[bytes]:
+    text = io.StringIO()
+    writer = csv.writer(text)
+    # 带 BOM，Excel 才能正确识别中文
+    text.write("\ufeff")
+    writer.writerow(ROW_FIELDS)
+    for tree in iter_result_trees(path):
+        writer.writerows(
+            [row[field] for field in ROW_FIELDS] for row in iter_flat_rows(tree)
+        )
+        yield text.getvalue().encode("utf-8")
+        text.seek(0)
+        text.truncate()
+    yield text.getvalue().encode("utf-8")
+
+
+_CONVERTERS = {"compact": _iter_compact, "ndjson": _iter_ndjson, "csv": _iter_csv}
+
+
+def iter_converted(path: str, target_format: str) -> Iterator[bytes]:
+    """
+    把结果文件流式转换为指定格式，逐块产出，不会生成完整的转换结果
+
+    Args:
+        path: 结果文件路径，可以是压缩文件
+        target_format: 目标格式，"compact"、"ndjson" 或 "csv"；
+            ndjson 与 csv 为每条评论一行的扁平格式
+
+    Yields:
+        转换后的数据块
+    """
+    if target_format not in _CONVERTERS:
+        raise ValueError(f"不支持的转换格式: {target_format}")
+
+    pending = []
+    pending_size = 0
+    for data in _CONVERTERS[target_format](path):
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= STREAM_BUFFER_SIZE:
+            yield b"".join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield b"".join(pending)
@@ -0,0 +1,336 @@
+import json
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 索引文件格式版本，结构变化时递增
+INDEX_VERSION = 2
+# 每个根评论的索引列，均为 int64；root_length 为根评论自身字段（"replies" 之前）的字节长度
+ENTRY_COLUMNS = (
+    "id",
+    "offset",
+    "length",
+    "root_length",
+    "likes",
+    "time",
+    "replies",
+)
+# 写入时预先计算好的排序（按对应列倒序排列的根评论下标），读取前N个时无需排序
+SORTED_COLUMNS = ("likes", "time", "replies")
+# 支持的排序字段；"id" 即结果文件中的原始顺序（评论ID倒序）
+SORT_FIELDS = ("id",) + SORTED_COLUMNS
+# 进程内保持打开的读取器数量上限
+INDEX_CACHE_SIZE = int(os.getenv("RESULT_INDEX_CACHE_SIZE", "32"))
+
+# 已打开的读取器：结果文件路径 -> ((mtime_ns, size), 读取器)
+_open_indexes: "OrderedDict[str, Tuple[Tuple[int, int], ResultIndex]]" = OrderedDict()
+_open_indexes_lock = threading.Lock()
+
+
+def index_path(path: str) -> str:
+    """返回结果文件对应的索引文件路径"""
+    return f"{path}.idx"
+
+
+def _time_key(formatted_time: str) -> int:
+    """把 "YYYY-MM-DD HH:MM:SS" 转换为可排序的整数 YYYYMMDDHHMMSS，无效时间为 0"""
+    digits = formatted_time.replace("-", "").replace(" ", "").replace(":", "")
+    return int(digits) if len(digits) == 14 and digits.isdigit() else 0
+
+
+def _format_time_key(key: int) -> str:
+    """_time_key 的逆运算"""
+    if not key:
+        return "未知时间"
+    s = str(key)
+    return f"{s[0:4]}-{s[4:6]}-{s[6:8]} {s[8:10]}:{s[10:12]}:{s[12:14]}"
+
+
+class ResultIndexBuilder:
+    """
+    在流式写入结果文件的同时收集每个根评论树的字节偏移、长度和统计，写完后生成索引文件。
+
+    索引文件由一行JSON头（补齐到8字节对齐）和若干 int64 列组成：
+    ENTRY_COLUMNS 中的各列，以及 SORTED_COLUMNS 中各列的倒序排列下标。
+    读取时直接 mmap 映射，无需解析。
+    """
+
+    def __init__(self):
+        self._columns = {name: array("q") for name in ENTRY_COLUMNS}
+
+    def add(
+        self,
+        root_id: int,
+        offset: int,
+        length: int,
+        root_length: int,
+        likes: int,
+        formatted_time: str,
+        replies: int,
+    ):
+        """
+        记录一个根评论树
+
+        Args:
+            root_id: 根评论ID
+            offset: 根评论树在结果文件中的字节偏移
+            length: 根评论树的字节长度
+            root_length: 根评论自身字段的字节长度，即从树的开头到 "replies" 键之前的逗号
+            likes: 根评论点赞数
+            formatted_time: 根评论发布时间（"YYYY-MM-DD HH:MM:SS"）
+            replies: 树中回复总数（不含根评论）
+        """
+        columns = self._columns
+        columns["id"].append(root_id)
+        columns["offset"].append(offset)
+        columns["length"].append(length)
+        columns["root_length"].append(root_length)
+        columns["likes"].append(likes)
+        columns["time"].append(_time_key(formatted_time))
+        columns["replies"].append(replies)
+
+    def write(self, path: str, total_comments: int, output_format: str) -> str:
+        """
+        为已写入完成的结果文件写入索引文件
+
+        Args:
+            path: 结果文件路径
+            total_comments: 结果文件中的评论总数
+            output_format: 结果文件格式
+
+        Returns:
+            索引文件路径
+        """
+        roots = len(self._columns["id"])
+        # 倒序排序保持稳定，值相同时仍按评论ID倒序
+        orders = {
+            name: array(
+                "q",
+                sorted(range(roots), key=self._columns[name].__getitem__, reverse=True),
+            )
+            for name in SORTED_COLUMNS
+        }
+        header = json.dumps(
+            {
+                "version": INDEX_VERSION,
+                "file": os.path.basename(path),
+                "size": os.path.getsize(path),
+                "output_format": output_format,
+                "roots": roots,
+                "total_comments": total_comments,
+                "byteorder": sys.byteorder,
+                "columns": list(ENTRY_COLUMNS),
+                "orders": list(SORTED_COLUMNS),
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        # 头部补齐到8字节，使后面的 int64 列对齐
+        header += b" " * (-(len(header) + 1) % 8) + b"\n"
+
+        sidecar = index_path(path)
+        tmp_path = f"{sidecar}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for name in ENTRY_COLUMNS:
+                self._columns[name].tofile(f)
+            for name in SORTED_COLUMNS:
+                orders[name].tofile(f)
+        os.replace(tmp_path, sidecar)
+        return sidecar
+
+
+class ResultIndex:
+    """
+    结果文件的随机访问读取器：通过索引定位根评论树，用 mmap 只解码需要的部分。
+    根评论以在结果文件中的位置（下标）表示。可作为上下文管理器使用。
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], index_data: mmap.mmap):
+        """
+        初始化读取器，一般通过 ResultIndex.open 创建
+
+        Args:
+            path: 结果文件路径
+            header: 已校验过的索引头
+            index_data: 映射到内存的索引文件
+        """
+        self.path = path
+        self.total_comments: int = header["total_comments"]
+        self.output_format: str = header["output_format"]
+        self._roots: int = header["roots"]
+        self._index_data = index_data
+        self._by_id: Optional[Dict[int, int]] = None
+
+        view = memoryview(index_data)
+        body = view[index_data.find(b"\n") + 1 :].cast("q")
+        # 关闭映射前需要释放所有指向它的视图
+        self._views = [view, body]
+        names = header["columns"] + [f"by_{name}" for name in header["orders"]]
+        self._columns = {
+            name: body[i * self._roots : (i + 1) * self._roots]
+            for i, name in enumerate(names)
+        }
+
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["ResultIndex"]:
+        """
+        打开结果文件及其索引
+
+        Args:
+            path: 结果文件路径
+
+        Returns:
+            读取器；索引不存在、版本不符或与结果文件大小不一致（已过期）时返回 None
+        """
+        sidecar = index_path(path)
+        if not os.path.exists(path) or not os.path.exists(sidecar):
+            return None
+        try:
+            with open(sidecar, "rb") as f:
+                index_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header = json.loads(index_data[: index_data.find(b"\n")])
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取索引文件 '{sidecar}' 失败，将忽略该文件。原因: {e}")
+            return None
+
+        # 结果文件被重写后索引即失效
+        stale = header.get("size") != os.path.getsize(path)
+        if (
+            header.get("version") != INDEX_VERSION
+            or header.get("byteorder") != sys.byteorder
+            or stale
+        ):
+            index_data.close()
+            return None
+        return cls(path, header, index_data)
+
+    def __len__(self) -> int:
+        return self._roots
+
+    def find(self, root_id: int) -> Optional[int]:
+        """按根评论ID查找其下标，不存在时返回 None"""
+        if self._by_id is None:
+            self._by_id = {root: i for i, root in enumerate(self._columns["id"])}
+        return self._by_id.get(root_id)
+
+    def entry(self, position: int) -> Dict[str, Any]:
+        """
+        返回一个根评论的索引信息
+
+        Args:
+            position: 根评论下标
+
+        Returns:
+            包含 id、offset、length、root_length、likes、time、replies 的字典
+        """
+        columns = self._columns
+        return {
+            "id": columns["id"][position],
+            "offset": columns["offset"][position],
+            "length": columns["length"][position],
+            "root_length": columns["root_length"][position],
+            "likes": columns["likes"][position],
+            "time": _format_time_key(columns["time"][position]),
+            "replies": columns["replies"][position],
+        }
+
+    def sorted_positions(
+        self, sort: str = "id", descending: bool = True
+    ) -> Sequence[int]:
+        """
+        按指定字段排序的根评论下标
+
+        Args:
+            sort: 排序字段，"id"（结果文件中的原始顺序）、"likes"、"time" 或 "replies"
+            descending: 是否倒序
+
+        Returns:
+            下标序列，可直接切片分页
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        if sort == "id":
+            positions = range(self._roots)
+        else:
+            positions = self._columns[f"by_{sort}"]
+        return positions if descending else positions[::-1]
+
+    def read_raw(self, position: int) -> bytes:
+        """读取一个根评论树在结果文件中的原始字节"""
+        offset = self._columns["offset"][position]
+        return self._mmap[offset : offset + self._columns["length"][position]]
+
+    def read_tree(self, position: int) -> Dict[str, Any]:
+        """解码一个根评论树"""
+        return json.loads(self.read_raw(position))
+
+    def read_root(self, position: int) -> Dict[str, Any]:
+        """只解码根评论自身的字段，不解码其下的回复（结果中没有 "replies" 键）"""
+        offset = self._columns["offset"][position]
+        return json.loads(
+            self._mmap[offset : offset + self._columns["root_length"][position]] + b"}"
+        )
+
+    def read_trees(self, positions: Sequence[int]) -> List[Dict[str, Any]]:
+        """按给定顺序解码多个根评论树"""
+        return [self.read_tree(position) for position in positions]
+
+    def close(self):
+        # 先释放指向映射内存的视图，映射才能关闭
+        for column in self._columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        for view in self._views:
+            view.release()
+        self._columns = {}
+        self._index_data.close()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def get_result_index(path: str) -> Optional[ResultIndex]:
+    """
+    获取结果文件的读取器，同一文件在进程内复用，文件被重写后自动重新打开
+
+    Args:
+        path: 结果文件路径
+
+    Returns:
+        读取器；结果文件或索引不存在、索引已过期时返回 None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _open_indexes_lock:
+        cached = _open_indexes.get(path)
+        if cached and cached[0] == key:
+            _open_indexes.move_to_end(path)
+            return cached[1]
+
+    index = ResultIndex.open(path)
+    if index is None:
+        return None
+    with _open_indexes_lock:
+        _open_indexes[path] = (key, index)
+        _open_indexes.move_to_end(path)
+        # 被淘汰的读取器可能仍在其他请求中使用，不主动关闭，交给垃圾回收
+        while len(_open_indexes) > INDEX_CACHE_SIZE:
+            _open_indexes.popitem(last=False)
+    return index
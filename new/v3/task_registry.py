@@ -0,0 +1,219 @@
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import redis
+
+from redis_store import DEFAULT_REDIS_URL, RedisStore
+
+TASK_REGISTRY_REDIS_URL = os.getenv("TASK_REGISTRY_REDIS_URL", DEFAULT_REDIS_URL)
+TASK_KEY_PREFIX = "crawler:task:"
+# 任务记录每次更新时发布到该前缀的频道，消息为本次更新的字段
+EVENT_CHANNEL_PREFIX = "crawler:events:"
+# 任务记录的过期时间（秒），从最后一次更新算起
+TASK_REGISTRY_TTL = int(os.getenv("TASK_REGISTRY_TTL", str(7 * 24 * 3600)))
+
+# 以 JSON 保存的字段
+JSON_FIELDS = ("result", "progress_detail")
+# 以浮点数时间戳保存的字段
+TIME_FIELDS = ("submitted_at", "started_at", "finished_at", "updated_at")
+
+
+def task_key(task_id: str) -> str:
+    """返回任务记录在 Redis 中的键"""
+    return f"{TASK_KEY_PREFIX}{task_id}"
+
+
+def event_channel(task_id: str) -> str:
+    """返回任务更新事件的发布频道"""
+    return f"{EVENT_CHANNEL_PREFIX}{task_id}"
+
+
+class TaskRegistry(RedisStore):
+    """
+    任务登记表：每个任务一个 Redis 哈希，记录状态（与 Celery 状态名一致）、提交/开始/结束时间、
+    最新进度、结果和错误信息。由 Celery 信号和任务本身写入，状态查询只需读取一个键，
+    不再向 Worker 发送 inspect 广播。每次更新同时发布到任务的事件频道，供推送接口订阅。
+    """
+
+    def __init__(self, redis_url: str = TASK_REGISTRY_REDIS_URL):
+        super().__init__(redis_url)
+
+    def _update(self, task_id: str, fields: Dict[str, Any]):
+        """写入任务记录的部分字段、刷新过期时间并发布更新事件，Redis 不可用时只打印警告"""
+        mapping = {"updated_at": str(time.time())}
+        for name, value in fields.items():
+            if value is None:
+                continue
+            mapping[name] = (
+                json.dumps(value, ensure_ascii=False)
+                if name in JSON_FIELDS
+                else str(value)
+            )
+        key = task_key(task_id)
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, TASK_REGISTRY_TTL)
+                pipe.publish(
+                    event_channel(task_id), json.dumps(mapping, ensure_ascii=False)
+                )
+                pipe.execute()
+        except redis.RedisError as e:
+            print(f"⚠️ 更新任务 {task_id} 的登记记录失败: {e}")
+
+    def mark_submitted(self, task_id: str, task_name: str, bv_id: Optional[str] = None):
+        """任务消息发送前登记为 PENDING"""
+        self._update(
+            task_id,
+            {
+                "status": "PENDING",
+                "task_name": task_name,
+                "bv_id": bv_id,
+                "submitted_at": time.time(),
+            },
+        )
+
+    def mark_started(self, task_id: str, worker: Optional[str] = None):
+        """Worker 开始执行任务"""
+        self._update(
+            task_id,
+            {"status": "STARTED", "worker": worker, "started_at": time.time()},
+        )
+
+    def mark_progress(
+        self, task_id: str, message: str, detail: Optional[Dict[str, Any]] = None
+    ):
+        """
+        更新任务进度
+
+        Args:
+            task_id: 任务 ID
+            message: 进度说明文字
+            detail: 结构化的进度计数，见 CrawlProgress.snapshot
+        """
+        self._update(
+            task_id,
+            {"status": "PROGRESS", "progress": message, "progress_detail": detail},
+        )
+
+    def mark_finished(
+        self,
+        task_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ):
+        """
+        任务结束
+
+        Args:
+            task_id: 任务 ID
+            status: 最终状态，SUCCESS、FAILURE 或 REVOKED
+            result: 成功时爬虫返回的结果字典
+            error: 失败时的错误信息
+        """
+        self._update(
+            task_id,
+            {
+                "status": status,
+                "result": result,
+                "error": error,
+                "finished_at": time.time(),
+            },
+        )
+
+    @staticmethod
+    def parse_record(record: Dict[str, str]) -> Dict[str, Any]:
+        """把 Redis 中的字符串字段还原为对应类型"""
+        parsed: Dict[str, Any] = dict(record)
+        for name in JSON_FIELDS:
+            if name in parsed:
+                parsed[name] = json.loads(parsed[name])
+        for name in TIME_FIELDS:
+            if name in parsed:
+                parsed[name] = float(parsed[name])
+        return parsed
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务记录
+
+        Args:
+            task_id: 任务 ID
+
+        Returns:
+            任务记录，不存在或 Redis 不可用时返回 None
+        """
+        try:
+            record = self.client.hgetall(task_key(task_id))
+        except redis.RedisError as e:
+            print(f"⚠️ 读取任务 {task_id} 的登记记录失败: {e}")
+            return None
+        return self.parse_record(record) if record else None
+
+    async def aget(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """get 的异步版本，供 async 接口使用，不阻塞事件循环"""
+        try:
+            record = await self.async_client.hgetall(task_key(task_id))
+        except redis.RedisError as e:
+            print(f"⚠️ 读取任务 {task_id} 的登记记录失败: {e}")
+            return None
+        return self.parse_record(record) if record else None
+
+    async def aget_many(self, task_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        在一次 Redis 往返中读取多个任务的记录
+
+        Args:
+            task_ids: 任务 ID 列表
+
+        Returns:
+            与 task_ids 顺序一致的记录列表，不存在的任务为 None；Redis 不可用时全部为 None
+        """
+        try:
+            async with self.async_client.pipeline(transaction=False) as pipe:
+                for task_id in task_ids:
+                    pipe.hgetall(task_key(task_id))
+                records = await pipe.execute()
+        except redis.RedisError as e:
+            print(f"⚠️ 批量读取任务登记记录失败: {e}")
+            return [None] * len(task_ids)
+        return [self.parse_record(record) if record else None for record in records]
+
+    async def awatch(
+        self, task_id: str, idle_timeout: float
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        订阅任务记录的变化。先订阅再读取当前记录，两者之间的更新不会丢失。
+        Redis 出错时抛出 redis.RedisError。
+
+        Args:
+            task_id: 任务 ID
+            idle_timeout: 等待更新的最长时间（秒）
+
+        Yields:
+            首先产出当前记录（不存在时为空字典），之后每次更新产出合并后的完整记录；
+            idle_timeout 内没有更新时产出 None，调用方可借此发送心跳、检查连接
+        """
+        pubsub = self.async_client.pubsub()
+        try:
+            await pubsub.subscribe(event_channel(task_id))
+            record = await self.async_client.hgetall(task_key(task_id))
+            yield self.parse_record(record)
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=idle_timeout
+                )
+                if message is None:
+                    yield None
+                    continue
+                record.update(json.loads(message["data"]))
+                yield self.parse_record(record)
+        finally:
+            await pubsub.aclose()
+
+
+# 进程内共享的登记表实例
+task_registry = TaskRegistry()
@@ -3,13 +3,44 @@ from bilibili_api import video, comment, sync
 from bilibili_api import Credential as BiliCredential
 
 import datetime
+import functools
 import os
 import json
 import asyncio
-import random
+import heapq
+import math
 import re
 from dataclasses import dataclass
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterator
+
+from rate_limiter import AdaptiveRateLimiter, is_throttle_error
+from result_converters import iter_result_trees
+from comment_records import CommentRecord
+from crawl_progress import CrawlProgress
+from crawl_state import CrawlStateStore, ThreadFingerprintCache
+from export_sinks import EXPORT_SUFFIXES
+from output_writers import (
+    COMPRESSION_SUFFIXES,
+    OUTPUT_FORMATS,
+    PRECOMPRESS_ENCODINGS,
+    artifact_content_encoding,
+    precompress_artifact,
+    resolve_compression,
+    write_comment_trees,
+)
+
+# 同一页内并发抓取子评论的根评论数量上限，可通过环境变量覆盖
+DEFAULT_SUB_COMMENT_CONCURRENCY = int(os.getenv("CRAWLER_SUB_COMMENT_CONCURRENCY", "8"))
+# 主评论页预取深度：子评论仍在抓取时，最多提前获取的主评论页数
+DEFAULT_MAIN_PAGE_PREFETCH = int(os.getenv("CRAWLER_MAIN_PAGE_PREFETCH", "2"))
+# 单个根评论下并发抓取子评论分页的数量上限，1 表示逐页抓取
+DEFAULT_SUB_PAGE_CONCURRENCY = int(os.getenv("CRAWLER_SUB_PAGE_CONCURRENCY", "4"))
+# 子评论接口接受的最大分页大小，设置更大的值不会生效
+SUB_COMMENT_PAGE_SIZE = 20
+# 遇到风控/超时时单个请求的最大重试次数
+DEFAULT_MAX_RETRIES = int(os.getenv("CRAWLER_MAX_RETRIES", "3"))
+# 时间戳格式化结果的缓存条数，同一秒内的评论共享一次格式化
+TIMESTAMP_CACHE_SIZE = 65536
 
 
 @dataclass
@@ -80,18 +111,61 @@ def load_latest_credential(directory: str) -> Optional[CredentialData]:
         return None
 
 
+@functools.lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _format_ctime(ctime) -> str:
+    """
+    将评论时间戳格式化为 "YYYY-MM-DD HH:MM:SS"，结果按秒缓存
+
+    Args:
+        ctime: 评论的发布时间戳
+
+    Returns:
+        格式化后的时间字符串，无效时间戳返回 "未知时间"
+    """
+    if not ctime:
+        return "未知时间"
+    try:
+        return datetime.datetime.fromtimestamp(ctime).strftime("%Y-%m-%d %H:%M:%S")
+    except Exception as e:
+        print(f"时间戳转换失败: {ctime}, 错误: {e}")
+        return "未知时间"
+
+
 class BilibiliCommentCrawler:
     """B站评论爬虫类"""
 
-    def __init__(self, cookie_data: Dict[str, str] = None, credential_dir: str = None):
+    def __init__(
+        self,
+        cookie_data: Dict[str, str] = None,
+        credential_dir: str = None,
+        sub_comment_concurrency: int = DEFAULT_SUB_COMMENT_CONCURRENCY,
+        main_page_prefetch: int = DEFAULT_MAIN_PAGE_PREFETCH,
+        sub_page_concurrency: int = DEFAULT_SUB_PAGE_CONCURRENCY,
+        rate_limiter: AdaptiveRateLimiter = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
         """
         初始化爬虫
 
         Args:
             cookie_data: 包含cookie信息的字典
             credential_dir: 凭证目录（如果不提供cookie_data时使用）
+            sub_comment_concurrency: 同一页内同时抓取子评论的根评论数量上限，1 表示串行
+            main_page_prefetch: 主评论页预取队列长度，即生产者最多领先消费者的页数
+            sub_page_concurrency: 单个根评论下并发抓取子评论分页的数量上限，1 表示逐页抓取
+            rate_limiter: 本次爬取所有请求共享的限速器，不提供时使用默认参数创建
+            max_retries: 遇到风控/超时时单个请求的最大重试次数
         """
         self.credential = None
+        self.sub_comment_concurrency = max(1, int(sub_comment_concurrency))
+        self.main_page_prefetch = max(1, int(main_page_prefetch))
+        self.sub_page_concurrency = max(1, int(sub_page_concurrency))
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_retries = max(0, int(max_retries))
+        # 抓取过程中出错、回复不完整的根评论rpid
+        self._incomplete_threads = set()
+        # 因直接使用预览回复而省去的子评论请求数
+        self.avoided_sub_requests = 0
 
         if cookie_data:
             # 使用传入的cookie数据
@@ -107,70 +181,46 @@ class BilibiliCommentCrawler:
             self.credential_dir = credential_dir
             self._load_credentials()
 
-    def _transform_comment_to_simplified_format(self, comment_data: Dict) -> Dict:
+    def _transform_comment_to_simplified_format(self, record: CommentRecord) -> Dict:
         """
-        将原始的B站评论数据转换为简化的中文字段格式
+        将评论记录转换为简化的中文字段格式
         确保与目标格式完全一致
 
+        使用显式栈单次遍历整棵树，回复层级再深也不会触发递归深度限制。
+
         Args:
-            comment_data: 原始的B站评论数据
+            record: 已挂载子评论的评论记录
 
         Returns:
             转换后的简化格式数据
         """
-        # 处理时间戳转换 - 确保格式为 "YYYY-MM-DD HH:MM:SS"
-        ctime = comment_data.get("ctime", 0)
-        formatted_time = "未知时间"
-        if ctime and isinstance(ctime, (int, float)):
-            try:
-                # 将时间戳转换为目标文件所需的格式
-                dt = datetime.datetime.fromtimestamp(ctime)
-                formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except Exception as e:
-                print(f"时间戳转换失败: {ctime}, 错误: {e}")
-                formatted_time = "未知时间"
-
-        # 获取父评论ID - 确保数据类型正确
-        parent_id = 0
-        if comment_data.get("parent", 0) != 0:
-            parent_id = int(comment_data.get("parent", 0))
-        elif comment_data.get("root", 0) != 0:
-            parent_id = int(comment_data.get("root", 0))
-
-        # 安全获取用户名
-        username = "未知用户"
-        member_info = comment_data.get("member", {})
-        if isinstance(member_info, dict):
-            username = member_info.get("uname", "未知用户")
-
-        # 安全获取评论内容
-        content_text = ""
-        content_info = comment_data.get("content", {})
-        if isinstance(content_info, dict):
-            content_text = content_info.get("message", "")
-
-        # 构建简化格式 - 确保字段顺序和类型与目标一致
-        simplified_comment = {
-            "评论ID": int(comment_data.get("rpid", 0)),
-            "用户名": str(username),
-            "评论内容": str(content_text),
-            "点赞数": int(comment_data.get("like", 0)),
-            "回复时间": formatted_time,
-            "父评论ID": parent_id,
-            "replies": [],
-        }
-
-        # 递归处理子评论
-        replies_data = comment_data.get("replies", [])
-        if replies_data and isinstance(replies_data, list):
-            for reply in replies_data:
-                if isinstance(reply, dict):
-                    simplified_reply = self._transform_comment_to_simplified_format(
-                        reply
-                    )
-                    simplified_comment["replies"].append(simplified_reply)
+        format_ctime = _format_ctime
+        root_comment = None
+        # 栈中保存 (待转换的记录, 转换结果要追加到的父评论replies列表)
+        stack = [(record, None)]
+        while stack:
+            node, parent_replies = stack.pop()
+            replies = []
+            # 构建简化格式 - 确保字段顺序和类型与目标一致
+            simplified_comment = {
+                "评论ID": node.rpid,
+                "用户名": node.uname,
+                "评论内容": node.message,
+                "点赞数": node.like,
+                "回复时间": format_ctime(node.ctime),
+                "父评论ID": node.parent if node.parent != 0 else node.root,
+                "replies": replies,
+            }
+            if parent_replies is None:
+                root_comment = simplified_comment
+            else:
+                parent_replies.append(simplified_comment)
 
-        return simplified_comment
+            # 逆序入栈，使子评论按原顺序出栈并追加
+            if node.replies:
+                stack.extend((child, replies) for child in reversed(node.replies))
+
+        return root_comment
 
     def _load_credentials_from_dict(self, cookie_data: Dict[str, str]):
         """从字典加载凭证"""
@@ -242,8 +292,42 @@ class BilibiliCommentCrawler:
         print(f"✅ [BV验证] BV号格式验证通过: '{bv_id}' (保持原始格式)")
         return True
 
-    async def get_all_sub_comments(self, oid: int, rpid: int) -> List[Dict]:
-        """异步获取一个根评论下的所有子评论（回复）"""
+    async def _request(self, make_request):
+        """
+        经限速器发出一次API请求，并根据结果调整限速器速率。
+        风控/超时类错误会在限速器退避后重试，其余错误直接抛出。
+
+        Args:
+            make_request: 无参函数，每次调用返回一个新的请求协程
+
+        Returns:
+            API返回的结果
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            try:
+                result = await make_request()
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                self.rate_limiter.record_throttle()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                print(f"  [!] 请求被限流，第 {attempt} 次重试: {e}")
+                continue
+
+            self.rate_limiter.record_success()
+            return result
+
+    async def get_all_sub_comments(self, oid: int, rpid: int) -> List[CommentRecord]:
+        """
+        异步获取一个根评论下的所有子评论（回复），每条回复到达后立即转换为精简记录
+
+        第一页返回后即可得知回复总数。开启分页并发（sub_page_concurrency > 1）时，
+        其余分页会在并发上限内同时抓取；否则逐页抓取。
+        """
         sub_comments = []
         page_num = 1
 
@@ -256,165 +340,646 @@ class BilibiliCommentCrawler:
 
         while True:
             try:
-                sub_comment_data = await c_obj.get_sub_comments(
-                    page_index=page_num, page_size=10
+                sub_comment_data = await self._request(
+                    lambda: c_obj.get_sub_comments(
+                        page_index=page_num, page_size=SUB_COMMENT_PAGE_SIZE
+                    )
                 )
 
                 if not sub_comment_data or not sub_comment_data.get("replies"):
                     break
 
-                sub_comments.extend(sub_comment_data["replies"])
+                sub_comments.extend(
+                    CommentRecord.from_api(r) for r in sub_comment_data["replies"]
+                )
+
+                total_count = sub_comment_data["page"]["count"]
+                if len(sub_comments) >= total_count:
+                    break
 
-                if len(sub_comments) >= sub_comment_data["page"]["count"]:
+                if page_num == 1 and self.sub_page_concurrency > 1:
+                    total_pages = math.ceil(total_count / SUB_COMMENT_PAGE_SIZE)
+                    sub_comments.extend(
+                        await self._fetch_sub_pages_concurrently(
+                            c_obj, range(2, total_pages + 1)
+                        )
+                    )
                     break
 
                 page_num += 1
-                await asyncio.sleep(random.uniform(0.5, 1.0))
 
             except Exception as e:
                 print(f"  [!] 获取 rpid={rpid} 的子评论时在第 {page_num} 页出错: {e}")
+                self._incomplete_threads.add(rpid)
                 break
 
         return sub_comments
 
+    async def _fetch_sub_pages_concurrently(
+        self, c_obj: "comment.Comment", page_numbers: range
+    ) -> List[CommentRecord]:
+        """
+        在 sub_page_concurrency 的并发上限内同时抓取一个根评论的多个子评论分页
+
+        Args:
+            c_obj: 根评论对象
+            page_numbers: 需要抓取的页码
+
+        Returns:
+            按页码顺序拼接的子评论记录列表，出错的分页会被跳过
+        """
+        semaphore = asyncio.Semaphore(self.sub_page_concurrency)
+
+        async def fetch(page_num: int) -> Dict:
+            async with semaphore:
+                return await self._request(
+                    lambda: c_obj.get_sub_comments(
+                        page_index=page_num, page_size=SUB_COMMENT_PAGE_SIZE
+                    )
+                )
+
+        pages = await asyncio.gather(
+            *(fetch(page_num) for page_num in page_numbers), return_exceptions=True
+        )
+
+        sub_comments = []
+        for page_num, page in zip(page_numbers, pages):
+            if isinstance(page, Exception):
+                print(
+                    f"  [!] 获取 rpid={c_obj.get_rpid()} 的子评论时在第 {page_num} 页出错: {page}"
+                )
+                self._incomplete_threads.add(c_obj.get_rpid())
+                continue
+            if page and page.get("replies"):
+                sub_comments.extend(CommentRecord.from_api(r) for r in page["replies"])
+        return sub_comments
+
+    async def _fetch_page_sub_comments(
+        self,
+        oid: int,
+        page_replies: List[Dict],
+        semaphore: asyncio.Semaphore,
+        thread_cache: ThreadFingerprintCache = None,
+    ) -> Dict[int, List[CommentRecord]]:
+        """
+        并发获取一页主评论中所有带回复的根评论的子评论
+
+        Args:
+            oid: 视频AID
+            page_replies: 当前页的主评论列表
+            semaphore: 限制同时进行的子评论抓取数量
+            thread_cache: 回复串指纹缓存，提供时指纹未变化的回复串直接复用上次输出中的回复
+
+        根评论自带的预览回复已包含全部回复（回复数不超过预览条数）时直接使用预览回复，
+        只有回复数超过预览条数的根评论才会请求子评论接口。
+
+        Returns:
+            以根评论rpid为键的子评论记录列表字典
+        """
+
+        async def fetch(rpid: int) -> List[CommentRecord]:
+            async with semaphore:
+                return await self.get_all_sub_comments(oid, rpid)
+
+        sub_comments_by_root = {}
+        roots_to_fetch = []
+        for c in page_replies:
+            rcount = c.get("rcount", 0)
+            if rcount <= 0:
+                continue
+            # 主评论接口自带的预览回复已覆盖全部回复时，无需再请求子评论接口
+            preview_replies = c.get("replies") or []
+            if len(preview_replies) >= rcount:
+                sub_comments_by_root[c["rpid"]] = sorted(
+                    (CommentRecord.from_api(r) for r in preview_replies),
+                    key=lambda r: r.rpid,
+                )
+                self.avoided_sub_requests += 1
+                continue
+            cached_replies = thread_cache.lookup(c) if thread_cache else None
+            if cached_replies is not None:
+                sub_comments_by_root[c["rpid"]] = cached_replies
+            else:
+                roots_to_fetch.append(c)
+
+        results = await asyncio.gather(*(fetch(c["rpid"]) for c in roots_to_fetch))
+        for root_comment, sub_comments in zip(roots_to_fetch, results):
+            sub_comments_by_root[root_comment["rpid"]] = sub_comments
+            # 抓取不完整的回复串不写入缓存，下次仍会重新抓取
+            if thread_cache and root_comment["rpid"] not in self._incomplete_threads:
+                thread_cache.update(root_comment, sub_comments)
+        return sub_comments_by_root
+
+    async def _iter_pages_by_index(
+        self, oid: int, progress_callback=None, start_page: int = 1
+    ):
+        """
+        按页码（page_index）逐页获取主评论，遇到空页时结束
+
+        Args:
+            oid: 视频AID
+            progress_callback: 进度回调函数
+            start_page: 起始页码，续爬时从断点的下一页开始
+
+        Yields:
+            (页码, 该页主评论列表, 下一页页码)
+        """
+        page_num = start_page
+        while True:
+            print(f"正在获取第 {page_num} 页主评论...")
+            if progress_callback:
+                progress_callback(f"正在获取第 {page_num} 页...")
+
+            main_comments_page = await self._request(
+                lambda: comment.get_comments(
+                    oid=oid,
+                    type_=comment.CommentResourceType.VIDEO,
+                    page_index=page_num,
+                    credential=self.credential,
+                )
+            )
+
+            if not main_comments_page or not main_comments_page.get("replies"):
+                print("已获取所有主评论页面。")
+                return
+
+            yield page_num, main_comments_page["replies"], page_num + 1
+            page_num += 1
+
+    async def _iter_pages_by_cursor(
+        self,
+        oid: int,
+        progress_callback=None,
+        start_page: int = 1,
+        start_offset: Optional[str] = "",
+    ):
+        """
+        沿游标（懒加载接口的 next_offset）逐页获取主评论。
+        游标分页不会因爬取期间新增评论而发生页面漂移。
+
+        Args:
+            oid: 视频AID
+            progress_callback: 进度回调函数
+            start_page: 起始页码（仅用于日志和检查点）
+            start_offset: 起始游标，续爬时为断点处的下一页偏移量；None 表示已经没有更多页面
+
+        Yields:
+            (页码, 该页主评论列表, 下一页偏移量)，最后一页的下一页偏移量为 None
+        """
+        if start_offset is None:
+            print("已获取所有主评论页面。")
+            return
+
+        page_num = start_page
+        offset = start_offset
+        while True:
+            print(f"正在获取第 {page_num} 页主评论（游标分页）...")
+            if progress_callback:
+                progress_callback(f"正在获取第 {page_num} 页...")
+
+            main_comments_page = await self._request(
+                lambda: comment.get_comments_lazy(
+                    oid=oid,
+                    type_=comment.CommentResourceType.VIDEO,
+                    offset=offset,
+                    credential=self.credential,
+                )
+            )
+
+            if not main_comments_page or not main_comments_page.get("replies"):
+                print("已获取所有主评论页面。")
+                return
+
+            cursor = main_comments_page.get("cursor") or {}
+            next_offset = (cursor.get("pagination_reply") or {}).get("next_offset")
+            if cursor.get("is_end") or not next_offset:
+                next_offset = None
+
+            yield page_num, main_comments_page["replies"], next_offset
+
+            if next_offset is None:
+                print("已获取所有主评论页面。")
+                return
+
+            offset = next_offset
+            page_num += 1
+
+    def _iter_main_pages(
+        self,
+        oid: int,
+        pagination_mode: str = "page",
+        progress_callback=None,
+        resume_from: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        根据分页模式选择主评论分页引擎
+
+        Args:
+            oid: 视频AID
+            pagination_mode: "page" 按页码分页，"cursor" 按游标分页
+            progress_callback: 进度回调函数
+            resume_from: 检查点中的进度（包含最后完成的页码 page 和继续位置 next），
+                提供时从断点之后继续翻页
+
+        Returns:
+            产出 (页码, 该页主评论列表, 下一页位置) 的异步迭代器
+        """
+        if pagination_mode == "cursor":
+            if resume_from:
+                return self._iter_pages_by_cursor(
+                    oid, progress_callback, resume_from["page"] + 1, resume_from["next"]
+                )
+            return self._iter_pages_by_cursor(oid, progress_callback)
+        if pagination_mode == "page":
+            if resume_from:
+                return self._iter_pages_by_index(
+                    oid, progress_callback, resume_from["next"]
+                )
+            return self._iter_pages_by_index(oid, progress_callback)
+        raise ValueError(f"不支持的分页模式: {pagination_mode}")
+
+    async def _produce_main_pages(
+        self,
+        oid: int,
+        page_queue: asyncio.Queue,
+        pagination_mode: str = "page",
+        progress_callback=None,
+        stop_at_rpid: int = 0,
+        resume_from: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        主评论页生产者：按顺序抓取主评论页并放入队列，领先消费者至多
+        main_page_prefetch 页。没有更多页面时放入 None 作为结束标记，出错时放入异常对象。
+
+        Args:
+            oid: 视频AID
+            page_queue: 与消费者共享的有界队列
+            pagination_mode: 分页模式，见 _iter_main_pages
+            progress_callback: 进度回调函数
+            stop_at_rpid: 增量爬取时上次已见过的最大根评论rpid。主评论按时间倒序返回，
+                遇到不大于它的评论即说明之后都是已有评论，立即停止翻页
+            resume_from: 检查点中的进度，提供时从断点之后继续翻页
+        """
+        pages = self._iter_main_pages(
+            oid, pagination_mode, progress_callback, resume_from
+        )
+        try:
+            async for page_num, page_replies, next_position in pages:
+                if stop_at_rpid:
+                    new_replies = [c for c in page_replies if c["rpid"] > stop_at_rpid]
+                    if new_replies:
+                        await page_queue.put((page_num, new_replies, next_position))
+                    if len(new_replies) < len(page_replies):
+                        print(
+                            f"已到达上次爬取过的评论（rpid <= {stop_at_rpid}），停止翻页。"
+                        )
+                        break
+                    continue
+
+                await page_queue.put((page_num, page_replies, next_position))
+        except Exception as e:
+            await page_queue.put(e)
+            return
+        finally:
+            await pages.aclose()
+
+        await page_queue.put(None)
+
+    def _iter_output_trees(
+        self, comment_trees: List[Dict], previous_file: str = None
+    ) -> Iterator[Dict]:
+        """
+        按评论ID倒序逐棵产出简化格式的根评论树，每棵树在被消费时才进行转换。
+        增量模式下与上次的输出归并，同一根评论以本次结果为准。
+
+        Args:
+            comment_trees: 已按rpid倒序排列的本次根评论记录
+            previous_file: 增量模式下上次输出的JSON文件路径
+
+        Yields:
+            简化格式的根评论树
+        """
+        new_trees = (
+            self._transform_comment_to_simplified_format(tree_node)
+            for tree_node in comment_trees
+        )
+        if not previous_file:
+            yield from new_trees
+            return
+
+        # 上次的输出逐棵读取，不把整个文件载入内存
+        new_ids = {tree_node.rpid for tree_node in comment_trees}
+        kept_comments = (
+            c for c in iter_result_trees(previous_file) if c["评论ID"] not in new_ids
+        )
+        print(
+            f"🔁 增量合并: 新增根评论 {len(comment_trees)} 条，与上次的输出逐棵归并。"
+        )
+        # 两个序列都已按评论ID倒序排列，直接归并
+        yield from heapq.merge(
+            new_trees, kept_comments, key=lambda c: c["评论ID"], reverse=True
+        )
+
     async def crawl_comments(
-        self, bv_id: str, save_dir: str = None, progress_callback=None
+        self,
+        bv_id: str,
+        save_dir: str = None,
+        progress_callback=None,
+        pagination_mode: str = "page",
+        incremental: bool = False,
+        reuse_unchanged_threads: bool = False,
+        task_id: str = None,
+        output_format: str = "json",
+        output_compression: str = "none",
+        export_formats: List[str] = None,
     ) -> Dict[str, Any]:
         """
         爬取指定BV号视频的评论，通过两阶段构建精确的树形结构并保存为JSON文件。
         第一阶段：获取所有评论到一个字典中。
         第二阶段：根据父子关系构建树，并彻底修正孤儿评论。
 
+        增量模式下按时间倒序翻页，遇到上次已爬取过的根评论即停止，
+        然后把新评论合并进上次的输出文件。已有根评论下新增的回复不会被获取。
+
         Args:
             bv_id: B站视频BV号
             save_dir: 保存目录
-            progress_callback: 进度回调函数
+            progress_callback: 进度回调函数，接收 CrawlProgress.snapshot() 返回的进度字典；
+                在线程中调用，两次调用至少间隔 CRAWLER_PROGRESS_FLUSH_MS 毫秒
+            pagination_mode: 主评论分页模式，"page" 按页码，"cursor" 按游标
+            incremental: 是否增量爬取
+            reuse_unchanged_threads: 是否复用上次抓取的、指纹未变化的回复串
+            task_id: 任务ID。提供时会定期写入检查点，任务被重新投递或重新提交时从断点继续
+            output_format: 输出格式，"json" 带缩进，"compact" 无缩进
+            output_compression: 输出压缩方式，"none"、"gzip" 或 "zstd"
+            export_formats: 额外导出的扁平格式（每条评论一行），可包含 "ndjson"、"parquet"、"sqlite"
 
         Returns:
             包含结果信息的字典
         """
         if not self._validate_bv_id(bv_id):
             return {"error": f"无效的BV号格式: {bv_id}", "status": "failed"}
+        if output_format not in OUTPUT_FORMATS:
+            return {"error": f"不支持的输出格式: {output_format}", "status": "failed"}
+        if output_compression not in COMPRESSION_SUFFIXES:
+            return {
+                "error": f"不支持的压缩方式: {output_compression}",
+                "status": "failed",
+            }
+        export_formats = list(export_formats or [])
+        unknown_formats = [f for f in export_formats if f not in EXPORT_SUFFIXES]
+        if unknown_formats:
+            return {
+                "error": f"不支持的导出格式: {', '.join(unknown_formats)}",
+                "status": "failed",
+            }
+        output_compression = resolve_compression(output_compression)
 
         bv_id = bv_id.strip()
         v = video.Video(bvid=bv_id, credential=self.credential)
-        comment_map = {}  # 使用字典存储所有评论，以rpid为键，自动处理重复
+        # 使用字典存储所有评论的精简记录，以rpid为键，自动处理重复
+        comment_map: Dict[int, CommentRecord] = {}
 
-        if progress_callback:
-            progress_callback("开始获取视频信息...")
+        save_dir = save_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "output"
+        )
+        state_store = CrawlStateStore(save_dir)
+        previous_state = None
+        if incremental:
+            previous_state = state_store.load_video_state(bv_id)
+            if not previous_state or not os.path.exists(
+                previous_state.get("file_path", "")
+            ):
+                print("ℹ️ 没有找到可用的上次爬取状态，本次执行完整爬取。")
+                previous_state = None
+            else:
+                print(
+                    f"🔁 增量爬取: 上次最大根评论 rpid={previous_state['max_rpid']}，"
+                    f"上次输出 {previous_state['file_path']}"
+                )
+        max_root_rpid = previous_state["max_rpid"] if previous_state else 0
+        newest_ctime = previous_state["newest_ctime"] if previous_state else 0
+        # 增量爬取在遇到上次已见过的根评论时停止翻页，完整爬取时为 0
+        stop_at_rpid = previous_state["max_rpid"] if previous_state else 0
+        thread_cache = None
+        if reuse_unchanged_threads:
+            # 读取指纹并打开上次输出的索引，在线程中执行，不阻塞事件循环
+            thread_cache = await asyncio.to_thread(state_store.load_thread_cache, bv_id)
+
+        checkpoint = None
+        resume_from = None
+        if task_id:
+            # 读取已有检查点可能要解析大量评论，在线程中执行
+            checkpoint, resume_from = await asyncio.to_thread(
+                state_store.open_checkpoint,
+                bv_id,
+                task_id,
+                pagination_mode,
+                stop_at_rpid,
+            )
+        if resume_from:
+            for row in resume_from["comments"]:
+                record = CommentRecord.from_row(row)
+                comment_map[record.rpid] = record
+            max_root_rpid = max(max_root_rpid, resume_from["max_root_rpid"])
+            newest_ctime = max(newest_ctime, resume_from["newest_ctime"])
+
+        # 进度只在内存中计数，由后台按间隔合并写出，不阻塞抓取
+        progress = CrawlProgress(progress_callback, self.rate_limiter)
+        progress.set_message("开始获取视频信息...")
 
         try:
             video_aid = v.get_aid()
-            info = await v.get_info()
+            info = await self._request(v.get_info)
             print(f"视频信息获取成功: AID={video_aid}, 标题={info['title']}")
+            progress.set_estimated_total((info.get("stat") or {}).get("reply"))
 
             # --- STAGE 1: 获取所有评论 ---
-            if progress_callback:
-                progress_callback("正在获取所有评论...")
-
-            page_num = 1
-            while True:
-                print(f"正在获取第 {page_num} 页主评论及其所有子评论...")
-                if progress_callback:
-                    progress_callback(f"正在获取第 {page_num} 页...")
-
-                main_comments_page = await comment.get_comments(
-                    oid=video_aid,
-                    type_=comment.CommentResourceType.VIDEO,
-                    page_index=page_num,
-                    credential=self.credential,
+            progress.set_message("正在获取所有评论...")
+
+            sub_comment_semaphore = asyncio.Semaphore(self.sub_comment_concurrency)
+            page_queue: asyncio.Queue = asyncio.Queue(maxsize=self.main_page_prefetch)
+            producer = asyncio.create_task(
+                self._produce_main_pages(
+                    video_aid,
+                    page_queue,
+                    pagination_mode,
+                    progress.set_message,
+                    stop_at_rpid=stop_at_rpid,
+                    resume_from=resume_from,
                 )
+            )
+            try:
+                while True:
+                    item = await page_queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+
+                    page_num, page_replies, next_position = item
+                    print(f"正在获取第 {page_num} 页主评论的所有子评论...")
+                    sub_comments_by_root = await self._fetch_page_sub_comments(
+                        video_aid, page_replies, sub_comment_semaphore, thread_cache
+                    )
+                    # 按页内顺序合并，保证结果与串行抓取一致；原始字典在本页处理完后即可释放
+                    page_records = []
+                    for p_comment in page_replies:
+                        record = CommentRecord.from_api(p_comment)
+                        page_records.append(record)
+                        page_records.extend(sub_comments_by_root.get(record.rpid, []))
+                        max_root_rpid = max(max_root_rpid, record.rpid)
+                        newest_ctime = max(newest_ctime, record.ctime)
+                    for record in page_records:
+                        comment_map[record.rpid] = record
+                    progress.add_page(
+                        len(page_replies), len(page_records) - len(page_replies)
+                    )
 
-                if not main_comments_page or not main_comments_page.get("replies"):
-                    print("已获取所有主评论页面。")
-                    break
-
-                page_replies = main_comments_page.get("replies", [])
-                for p_comment in page_replies:
-                    comment_map[p_comment["rpid"]] = p_comment
-
-                    if p_comment.get("rcount", 0) > 0:
-                        sub_comments = await self.get_all_sub_comments(
-                            video_aid, p_comment["rpid"]
-                        )
-                        for sub in sub_comments:
-                            comment_map[sub["rpid"]] = sub
-
-                page_num += 1
-                await asyncio.sleep(random.uniform(1.0, 2.5))
+                    if checkpoint:
+                        page_comments = [record.to_row() for record in page_records]
+                        if checkpoint.record_page(
+                            page_num,
+                            next_position,
+                            page_comments,
+                            max_root_rpid,
+                            newest_ctime,
+                        ):
+                            # 编码与 fsync 在线程中执行，子评论抓取和进度写出不会因此停顿
+                            await asyncio.to_thread(checkpoint.flush)
+            finally:
+                if not producer.done():
+                    producer.cancel()
+                    await asyncio.gather(producer, return_exceptions=True)
+                if checkpoint:
+                    # 无论成功与否都把已完成的页面落盘，失败重试时可从这里继续
+                    await asyncio.to_thread(checkpoint.flush)
 
             total_raw_comments = len(comment_map)
             print(f"✅ 获取阶段完成，共获得 {total_raw_comments} 条独立评论。")
-            if progress_callback:
-                progress_callback(
-                    f"获取完成，共 {total_raw_comments} 条，开始构建评论树..."
+            print(
+                f"👀 预览回复: {self.avoided_sub_requests} 个根评论直接使用了自带的完整回复，省去对应的子评论请求。"
+            )
+            if thread_cache:
+                print(
+                    f"♻️ 回复串缓存: 复用 {thread_cache.hits} 个未变化的回复串，"
+                    f"重新抓取 {thread_cache.misses} 个。"
                 )
+            progress.set_message(
+                f"获取完成，共 {total_raw_comments} 条，开始构建评论树..."
+            )
 
             # --- STAGE 2: 从MAP构建正确的树形结构 ---
             print("🔄 开始根据父子关系构建精确的评论树...")
             for c_obj in comment_map.values():
-                c_obj["replies"] = []
+                c_obj.replies = None
 
             comment_trees = []
             for c_obj in comment_map.values():
-                parent_id = c_obj.get("parent", 0)
+                parent_id = c_obj.parent
                 if parent_id == 0:
                     comment_trees.append(c_obj)
                 else:
                     parent_obj = comment_map.get(parent_id)
                     if parent_obj:
-                        parent_obj["replies"].append(c_obj)
+                        if parent_obj.replies is None:
+                            parent_obj.replies = []
+                        parent_obj.replies.append(c_obj)
                     else:
                         # [!!!] 终极修正 [!!!]
                         # 当评论的父评论找不到时（孤儿评论），必须同时将它的 parent 和 root 都设为0
                         # 这样才能确保格式转换函数能正确地将其识别为顶层评论
                         print(
-                            f"⚠️ 警告: 评论 rpid={c_obj['rpid']} 的父评论 rpid={parent_id} 未找到。正在将其修正为顶层评论。"
+                            f"⚠️ 警告: 评论 rpid={c_obj.rpid} 的父评论 rpid={parent_id} 未找到。正在将其修正为顶层评论。"
                         )
-                        c_obj["parent"] = 0
-                        c_obj["root"] = 0  # <--- 这就是最关键的补充修正！
+                        c_obj.parent = 0
+                        c_obj.root = 0  # <--- 这就是最关键的补充修正！
                         comment_trees.append(c_obj)
 
             print("✅ 评论树结构构建完成。")
 
-            if not comment_trees:
+            if not comment_trees and not previous_state:
                 return {"error": "未能获取到任何评论", "status": "failed"}
 
             # --- STAGE 3: 转换数据格式并保存 ---
-            if progress_callback:
-                progress_callback("转换数据格式...")
+            progress.set_message("转换数据格式...")
 
-            print("🔄 开始将评论树转换为目标JSON格式...")
-            comment_trees.sort(key=lambda x: x["rpid"], reverse=True)
-            simplified_comments = [
-                self._transform_comment_to_simplified_format(tree_node)
-                for tree_node in comment_trees
-            ]
-            print("✅ 格式转换完成。")
+            comment_trees.sort(key=lambda x: x.rpid, reverse=True)
 
             title = re.sub(r'[\\/:"*?<>|]', "_", info["title"])
-            filename = f"{title}_comments.json"
-            save_dir = save_dir or os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), "output"
+            filename = (
+                f"{title}_comments.json{COMPRESSION_SUFFIXES[output_compression]}"
             )
             os.makedirs(save_dir, exist_ok=True)
             save_path = os.path.join(save_dir, filename)
 
-            print(f"💾 正在保存到: {save_path}")
-            with open(save_path, "w", encoding="utf-8") as jsonfile:
-                json.dump(simplified_comments, jsonfile, ensure_ascii=False, indent=2)
+            # 逐棵转换并立即写入，不在内存中保留完整的转换结果；在线程中执行，不阻塞事件循环
+            print(f"🔄 开始将评论树转换为目标JSON格式并流式保存到: {save_path}")
+            write_stats = await asyncio.to_thread(
+                write_comment_trees,
+                save_path,
+                self._iter_output_trees(
+                    comment_trees,
+                    previous_state["file_path"] if previous_state else None,
+                ),
+                output_format,
+                output_compression,
+                export_formats,
+            )
+            total_comments = write_stats["total_comments"]
+            print(
+                f"✅ 格式转换与保存完成，共 {write_stats['roots']} 条根评论、{total_comments} 条评论。"
+            )
+            for export_format, export_path in write_stats["export_files"].items():
+                print(f"📦 已导出 {export_format}: {export_path}")
+
+            # 为未压缩的结果文件生成预压缩副本，下载时直接发送
+            precompressed_files = {}
+            if PRECOMPRESS_ENCODINGS and output_compression == "none":
+                precompressed_files = await asyncio.to_thread(
+                    precompress_artifact, save_path, PRECOMPRESS_ENCODINGS
+                )
+                for encoding, sibling in precompressed_files.items():
+                    print(f"📦 已生成 {encoding} 预压缩副本: {sibling}")
+
+            if thread_cache:
+                # 指纹对应本次的输出文件，下次复用的回复从它的索引中读取
+                await asyncio.to_thread(
+                    state_store.save_thread_cache, bv_id, thread_cache, save_path
+                )
+
+            state_store.save_video_state(
+                bv_id,
+                max_rpid=max_root_rpid,
+                newest_ctime=newest_ctime,
+                file_path=save_path,
+                total_comments=total_comments,
+            )
 
             result = {
                 "file_path": save_path,
                 "video_title": info["title"],
                 "bv_id": bv_id,
-                "total_comments": len(comment_map),
+                "total_comments": total_comments,
+                "incremental": previous_state is not None,
+                "new_comments": len(comment_map),
+                "reused_threads": thread_cache.hits if thread_cache else 0,
+                "avoided_sub_requests": self.avoided_sub_requests,
+                "rate_limit": self.rate_limiter.stats(),
+                "output_format": output_format,
+                "content_encoding": artifact_content_encoding(save_path),
+                "export_files": write_stats["export_files"],
+                "index_file": write_stats["index_file"],
+                "precompressed_files": precompressed_files,
             }
 
-            if progress_callback:
-                progress_callback("爬取完成！")
+            if checkpoint:
+                checkpoint.discard()
+
+            progress.set_message("爬取完成！")
 
             print(f"\n爬取完成！评论已保存到文件：{save_path}")
+            print(f"⏱️ 限速统计: {self.rate_limiter.stats()}")
             return result
 
         except Exception as e:
@@ -428,6 +993,12 @@ class BilibiliCommentCrawler:
                 "error_type": type(e).__name__,
                 "status": "failed",
             }
+        finally:
+            if checkpoint:
+                # 释放检查点的文件锁，之后重新提交的任务才能接管它
+                checkpoint.close()
+            # 最后的进度要先于任务结果写入
+            await progress.aclose()
 
 
 # 便捷函数
@@ -437,6 +1008,16 @@ async def crawl_bilibili_comments(
     save_dir: str = None,
     credential_dir: str = None,
     progress_callback=None,
+    sub_comment_concurrency: int = DEFAULT_SUB_COMMENT_CONCURRENCY,
+    main_page_prefetch: int = DEFAULT_MAIN_PAGE_PREFETCH,
+    sub_page_concurrency: int = DEFAULT_SUB_PAGE_CONCURRENCY,
+    pagination_mode: str = "page",
+    incremental: bool = False,
+    reuse_unchanged_threads: bool = False,
+    task_id: str = None,
+    output_format: str = "json",
+    output_compression: str = "none",
+    export_formats: List[str] = None,
 ) -> Dict[str, Any]:
     """
     便捷的爬取函数
@@ -446,12 +1027,28 @@ async def crawl_bilibili_comments(
         cookie_data: Cookie数据字典
         save_dir: 保存目录
         credential_dir: 凭证目录（如果不提供cookie_data时使用）
-        progress_callback: 进度回调函数
+        progress_callback: 进度回调函数，接收进度字典，见 BilibiliCommentCrawler.crawl_comments
+        sub_comment_concurrency: 同一页内同时抓取子评论的根评论数量上限
+        main_page_prefetch: 主评论页预取深度
+        sub_page_concurrency: 单个根评论下并发抓取子评论分页的数量上限
+        pagination_mode: 主评论分页模式，"page" 按页码，"cursor" 按游标
+        incremental: 是否增量爬取（只获取上次爬取之后的新评论并合并到上次的输出）
+        reuse_unchanged_threads: 是否复用上次抓取的、指纹未变化的回复串
+        task_id: 任务ID，用于检查点与断点续爬
+        output_format: 输出格式，"json" 带缩进，"compact" 无缩进
+        output_compression: 输出压缩方式，"none"、"gzip" 或 "zstd"
+        export_formats: 额外导出的扁平格式，可包含 "ndjson"、"parquet"、"sqlite"
 
     Returns:
         包含结果信息的字典
     """
-    crawler = BilibiliCommentCrawler(cookie_data, credential_dir)
+    crawler = BilibiliCommentCrawler(
+        cookie_data,
+        credential_dir,
+        sub_comment_concurrency=sub_comment_concurrency,
+        main_page_prefetch=main_page_prefetch,
+        sub_page_concurrency=sub_page_concurrency,
+    )
 
     # === BV号追踪日志 - 爬虫便捷函数层 ===
     print(
@@ -459,7 +1056,18 @@ async def crawl_bilibili_comments(
     )
     print(f"🔍 [爬虫便捷函数] 即将传递给crawler.crawl_comments的BV号: '{bv_id}'")
 
-    return await crawler.crawl_comments(bv_id, save_dir, progress_callback)
+    return await crawler.crawl_comments(
+        bv_id,
+        save_dir,
+        progress_callback,
+        pagination_mode=pagination_mode,
+        incremental=incremental,
+        reuse_unchanged_threads=reuse_unchanged_threads,
+        task_id=task_id,
+        output_format=output_format,
+        output_compression=output_compression,
+        export_formats=export_formats,
+    )
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import { Cookie } from "@/types/cookie";
 import {
   startCrawlTask,
   getCrawlStatus,
+  getCrawlEventsUrl,
   setApiConfig,
   downloadCommentData,
   getApiConfig,
@@ -29,6 +30,7 @@ export const useCrawlerStore = (): CrawlerStore => {
   const [currentUrl] = useState("");
 
   const pollingRef = useRef<NodeJS.Timeout | null>(null);
+  const eventSourceRef = useRef<EventSource | null>(null); // 任务状态事件流
   const pollStartTimeRef = useRef<number>(0); // 轮询开始时间
 
   // 检查是否在浏览器环境中
@@ -117,7 +119,56 @@ export const useCrawlerStore = (): CrawlerStore => {
     }
   }, []);
 
-  // 轮询任务进度
+  // 根据状态数据（轮询响应或事件流消息，格式相同）更新界面，返回任务是否已结束
+  const applyStatus = useCallback((data: Record<string, unknown>, elapsedTime: number): boolean => {
+    const status = data.status || "UNKNOWN";
+    const progressText = data.progress || "";
+
+    if (progressText && typeof progressText === 'string') {
+      setCrawlStatus(progressText);
+    }
+
+    if (typeof data.progress === "number") {
+      setProgress(data.progress);
+    }
+
+    const terminalStates = ["SUCCESS", "FAILURE", "REVOKED", "ERROR"];
+
+    if (typeof status === 'string' && terminalStates.includes(status)) {
+      console.log(`✅ 任务结束，最终状态: ${status}`);
+
+      if (status === "SUCCESS") {
+        setShowDownloadButton(true);
+        setCrawlStatus("爬取完成！点击下载按钮获取评论数据");
+      } else if (status === "FAILURE") {
+        setCrawlStatus(`任务失败: ${data.error || "未知错误"}`);
+      } else {
+        setCrawlStatus(`任务状态: ${status}`);
+      }
+      return true;
+    }
+
+    // 显示已经运行的时间
+    const minutes = Math.floor(elapsedTime / 60000);
+    const seconds = Math.floor((elapsedTime % 60000) / 1000);
+    const timeStr = minutes > 0 ? `${minutes}分${seconds}秒` : `${seconds}秒`;
+    console.log(`🔍 任务进行中... 状态: ${status}, 已运行: ${timeStr}`);
+    return false;
+  }, []);
+
+  // 关闭事件流并停止轮询
+  const stopTracking = useCallback(() => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+    if (pollingRef.current) {
+      clearInterval(pollingRef.current);
+      pollingRef.current = null;
+    }
+  }, []);
+
+  // 轮询任务进度（事件流不可用时的回退方式）
   const startPolling = useCallback((task_id: string) => {
     if (pollingRef.current) clearInterval(pollingRef.current);
     
@@ -150,37 +201,8 @@ export const useCrawlerStore = (): CrawlerStore => {
           }
         }
 
-        const status = data.status || "UNKNOWN";
-        const progressText = data.progress || "";
-
-        if (progressText && typeof progressText === 'string') {
-          setCrawlStatus(progressText);
-        }
-
-        if (typeof data.progress === "number") {
-          setProgress(data.progress);
-        }
-
-        const terminalStates = ["SUCCESS", "FAILURE", "REVOKED", "ERROR"];
-
-        if (typeof status === 'string' && terminalStates.includes(status)) {
+        if (applyStatus(data, elapsedTime)) {
           clearInterval(pollingRef.current!);
-          console.log(`✅ 轮询结束，最终状态: ${status}`);
-
-          if (status === "SUCCESS") {
-            setShowDownloadButton(true);
-            setCrawlStatus("爬取完成！点击下载按钮获取评论数据");
-          } else if (status === "FAILURE") {
-            setCrawlStatus(`任务失败: ${data.error || "未知错误"}`);
-          } else {
-            setCrawlStatus(`任务状态: ${status}`);
-          }
-        } else {
-          // 显示已经轮询的时间
-          const minutes = Math.floor(elapsedTime / 60000);
-          const seconds = Math.floor((elapsedTime % 60000) / 1000);
-          const timeStr = minutes > 0 ? `${minutes}分${seconds}秒` : `${seconds}秒`;
-          console.log(`🔍 轮询中... 状态: ${status}, 已运行: ${timeStr}`);
         }
       } catch (error) {
         console.error("轮询失败:", error);
@@ -191,7 +213,48 @@ export const useCrawlerStore = (): CrawlerStore => {
         setCrawlStatus(`状态查询失败: 网络错误 (已运行: ${timeStr})`);
       }
     }, config.pollInterval);
-  }, []);
+  }, [applyStatus]);
+
+  // 跟踪任务进度：优先使用服务端推送的事件流，浏览器不支持或连接失败时回退为轮询
+  const startTracking = useCallback((task_id: string) => {
+    stopTracking();
+
+    if (typeof EventSource === "undefined") {
+      startPolling(task_id);
+      return;
+    }
+
+    pollStartTimeRef.current = Date.now();
+    console.log(`📡 订阅任务 ${task_id} 的状态事件流`);
+
+    const source = new EventSource(getCrawlEventsUrl(task_id));
+    eventSourceRef.current = source;
+    let finished = false;
+
+    source.onmessage = (event: MessageEvent) => {
+      let data: Record<string, unknown>;
+      try {
+        data = JSON.parse(event.data);
+      } catch (error) {
+        console.warn("无法解析任务状态事件:", error);
+        return;
+      }
+      if (applyStatus(data, Date.now() - pollStartTimeRef.current)) {
+        finished = true;
+        source.close();
+        eventSourceRef.current = null;
+      }
+    };
+
+    source.onerror = () => {
+      if (finished) return;
+      // 后端不支持推送、Redis 不可用或连接中断：关闭事件流，改为轮询
+      console.warn("任务状态事件流连接失败，改用轮询");
+      source.close();
+      eventSourceRef.current = null;
+      startPolling(task_id);
+    };
+  }, [applyStatus, startPolling, stopTracking]);
 
   // 初始化
   useEffect(() => {
@@ -218,11 +281,9 @@ export const useCrawlerStore = (): CrawlerStore => {
   // 清理
   useEffect(() => {
     return () => {
-      if (pollingRef.current) {
-        clearInterval(pollingRef.current);
-      }
+      stopTracking();
     };
-  }, []);
+  }, [stopTracking]);
 
   // 操作函数
   const getCookiesFromExtension = useCallback(
@@ -409,7 +470,7 @@ export const useCrawlerStore = (): CrawlerStore => {
       if (data && typeof data === 'object' && 'task_id' in data && data.task_id) {
         setCrawlStatus("任务已提交，正在爬取...");
         setCurrentTaskId(String(data.task_id));
-        startPolling(String(data.task_id));
+        startTracking(String(data.task_id));
       } else {
         const errorMsg = (data && typeof data === 'object' && 'error' in data) 
           ? String(data.error) 
@@ -420,7 +481,7 @@ export const useCrawlerStore = (): CrawlerStore => {
       console.error("爬取任务错误:", err);
       setCrawlStatus("请求失败: 后端API尚未实现，请先开发后端接口");
     }
-  }, [bv, cookies, startPolling]);
+  }, [bv, cookies, startTracking]);
 
   const downloadFile = useCallback(
     async (taskId: string) => {
@@ -504,12 +565,11 @@ export const useCrawlerStore = (): CrawlerStore => {
 
   // 通用操作
   const stopPolling = useCallback(() => {
-    if (pollingRef.current) {
-      clearInterval(pollingRef.current);
-      pollingRef.current = null;
+    if (pollingRef.current || eventSourceRef.current) {
+      stopTracking();
       setCrawlStatus("已停止状态轮询");
     }
-  }, []);
+  }, [stopTracking]);
 
   const setMessage = useCallback((message: string) => {
     // 这个函数保留但不做任何操作，保持接口兼容性
@@ -226,6 +226,15 @@ export async function getCrawlStatus(taskId: string) {
   }
 }
 
+/**
+ * 获取任务状态事件流（Server-Sent Events）的地址
+ * @param taskId 任务ID
+ * @returns 事件流URL，每条事件的数据与 getCrawlStatus 的接口响应相同
+ */
+export function getCrawlEventsUrl(taskId: string): string {
+  return `${apiConfig.baseURL.replace(/\/+$/, "")}/api/events/${taskId}`;
+}
+
 /**
  * 下载爬取完成的评论数据
  * @param taskId 任务ID